@@ -0,0 +1,69 @@
+# bench_startup.py
+"""
+Startup-time budget check based on `python -X importtime`.
+
+    python bench_startup.py [--budget-ms 800] [--module phase2_optimized_evaluate ...]
+
+Each module is imported in a fresh interpreter; the cumulative import time of
+the module itself is compared against the budget. Modules must not import
+Prophet, shap, xgboost, pmdarima, matplotlib or sklearn at import time.
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_MODULES = [
+    "config",
+    "cli",
+    "phase2_optimized_evaluate",
+    "phase2_optimized_forecasting",
+    "phase2_optimized_models_churn",
+    "phase2_optimized_recommender",
+]
+HEAVY_PACKAGES = ("prophet", "shap", "xgboost", "pmdarima", "matplotlib", "sklearn", "seaborn")
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|\s+(\s*)(\S+)")
+
+def measure_import(module: str) -> dict:
+    """Import `module` in a fresh interpreter and parse the -X importtime report."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=SCRIPTS_DIR, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{proc.stderr.strip().splitlines()[-1]}")
+    cumulative, loaded = {}, set()
+    for line in proc.stderr.splitlines():
+        m = IMPORTTIME_LINE.match(line)
+        if m:
+            name = m.group(4)
+            cumulative[name] = int(m.group(2))
+            loaded.add(name.split(".")[0])
+    return {
+        "module": module,
+        "cumulative_ms": cumulative.get(module, 0) / 1000,
+        "heavy": sorted(loaded.intersection(HEAVY_PACKAGES)),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--budget-ms", type=float, default=800.0)
+    parser.add_argument("--module", action="append", dest="modules")
+    args = parser.parse_args(argv)
+
+    failed = False
+    for module in args.modules or DEFAULT_MODULES:
+        res = measure_import(module)
+        over = res["cumulative_ms"] > args.budget_ms
+        status = "FAIL" if over or res["heavy"] else "OK"
+        failed |= status == "FAIL"
+        heavy = f" heavy imports: {', '.join(res['heavy'])}" if res["heavy"] else ""
+        print(f"[{status}] {module}: {res['cumulative_ms']:.1f} ms (budget {args.budget_ms:.0f} ms){heavy}")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+# cli.py
+"""
+Single entry point for the pipeline stages.
+
+    python cli.py <stage> [options]
+
+Stage modules are imported only when their stage runs, so short jobs such as
+`python cli.py metrics` never pay for Prophet, sklearn or matplotlib.
+"""
+import argparse
+import importlib
+import sys
+
+import config
+
+# stage name -> (module, function, help)
+STAGES = {
+    "ingest": ("ingest_sales_workbooks", "main", "Convert POS workbooks in data/ to cached parquet"),
+    "phase1": ("phase1_data_pipeline", "run_pipeline", "Load from MySQL, clean, plot and export"),
+    "clean-sql": ("phase1_cleaning_job", "main", "Incrementally upsert new sales rows into sales_cleaned"),
+    "validate": ("phase1_validation", "main", "Run the data-quality checks on clean_sales.csv"),
+    "phase2": ("phase2_optimized_pipeline", "run_phase2_optimized", "Run the full optimized phase-2 pipeline"),
+    "features": ("phase2_optimized_feature_engineering", "main", "Build and export the feature matrix"),
+    "entities": ("phase2_optimized_entities", "main", "Build the entity table with churn labels"),
+    "churn": ("phase2_optimized_models_churn", "main", "Train churn models and export predictions"),
+    "forecast": ("phase2_optimized_forecasting", "main", "Fit Prophet and export the forecast"),
+    "backtest": ("phase2_optimized_backtesting", "main", "Rolling-origin backtest of every forecast backend"),
+    "serve-forecast": ("phase2_optimized_forecast_service", "main", "Cached per-store forecasts (cold vs warm query timing)"),
+    "batch-forecast": ("phase2_optimized_batch_forecasting", "main", "Per-product forecasts with the NumPy engine"),
+    "intraday": ("phase2_optimized_intraday", "main", "Hourly demand cube and staffing forecast"),
+    "recommend": ("phase2_optimized_recommender", "main", "Build and export item recommendations"),
+    "neighbor-index": ("phase2_optimized_neighbor_index", "main", "Build the memory-mapped neighbor index"),
+    "recommend-refresh": ("phase2_optimized_recommender_state", "main", "Fold new transactions into the recommender state"),
+    "basket": ("phase2_optimized_basket", "main", "Mine FP-growth association rules"),
+    "models": ("phase2_optimized_registry", "main", "List registered model versions (* = active)"),
+    "bootstrap": ("phase2_optimized_bootstrap", "main", "Bootstrap CIs for churn and backtest metrics"),
+    "metrics": ("phase2_optimized_evaluate", "main", "Re-export metrics from existing outputs"),
+}
+
+def _threshold(text: str) -> tuple:
+    """CHECK=RATE, e.g. unknown_category=0.05."""
+    name, _, rate = text.partition("=")
+    try:
+        return name.strip(), float(rate)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected CHECK=RATE, got '{text}'")
+
+def _add_validation_args(stage: argparse.ArgumentParser):
+    stage.add_argument("--date-min", default=None, help="earliest valid transaction_date (YYYY-MM-DD)")
+    stage.add_argument("--date-max", default=None, help="latest valid transaction_date (YYYY-MM-DD)")
+    stage.add_argument("--threshold", dest="thresholds", type=_threshold, action="append", default=None,
+                       metavar="CHECK=RATE", help="max failing share for one check; repeatable")
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="cli.py", description="Coffee sales pipeline stages")
+    sub = parser.add_subparsers(dest="stage", required=True)
+    for name, (_, _, help_text) in STAGES.items():
+        stage = sub.add_parser(name, help=help_text)
+        if name == "phase1":
+            stage.add_argument("--source", default="mysql", choices=["mysql", "workbooks"])
+            stage.add_argument("--source-dir", default=config.DATA_DIR)
+            _add_validation_args(stage)
+        if name == "validate":
+            _add_validation_args(stage)
+        if name == "ingest":
+            stage.add_argument("--source-dir", default=config.DATA_DIR)
+        if name == "phase2":
+            stage.add_argument("--horizon", type=int, default=30)
+            stage.add_argument("--no-tune-rf", dest="tune_rf", action="store_false")
+            # literal copies of FORECAST_BACKENDS / CHURN_BACKENDS: importing them would load pandas
+            stage.add_argument("--forecast-backend", default="prophet",
+                               choices=["prophet", "seasonal_naive", "holt_winters", "ridge"])
+            stage.add_argument("--churn-backend", default="rf", choices=["rf", "hgb"])
+    return parser
+
+def run_stage(name: str, **kwargs):
+    module_name, func_name, _ = STAGES[name]
+    module = importlib.import_module(module_name)
+    return getattr(module, func_name)(**kwargs)
+
+def main(argv=None):
+    args = vars(build_parser().parse_args(argv))
+    stage = args.pop("stage")
+    config.setup_logging()
+    run_stage(stage, **args)
+
+if __name__ == "__main__":
+    sys.exit(main())
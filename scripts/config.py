@@ -1,10 +1,13 @@
 import os
 import logging
-from dotenv import load_dotenv
 
 # === Base Paths ===
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 OUTPUT_DIR = os.path.join(BASE_DIR, "outputs")
+DATA_DIR = os.path.join(BASE_DIR, "data")
+
+# === Ingestion: POS workbooks converted to parquet ===
+INGEST_DIR = os.path.join(OUTPUT_DIR, "ingest")
 
 # === Phase 1 output paths ===
 PHASE1_DIR = os.path.join(OUTPUT_DIR, "phase1")
@@ -27,13 +30,6 @@ PHASE2_OPT_MODELS = os.path.join(PHASE2_OPT_DIR, "models")
 PHASE2_OPT_METRICS = os.path.join(PHASE2_OPT_DIR, "metrics")
 PHASE2_OPT_LOGS = os.path.join(PHASE2_OPT_DIR, "logs")
 
-# === Create all directories if not exist ===
-for path in [PHASE1_CLEAN, PHASE1_PLOTS, PHASE1_LOGS,
-             PHASE2_FEATURES, PHASE2_MODELS, PHASE2_METRICS, PHASE2_LOGS,
-             PHASE2_OPT_FEATURES, PHASE2_OPT_MODELS, PHASE2_OPT_METRICS, PHASE2_OPT_LOGS]:
-    os.makedir(path)
-
-
 # === PATHS dictionary for Phase 2 scripts ===
 PATHS = {
     "features": os.path.join(PHASE2_FEATURES, "features.csv"),
@@ -52,22 +48,53 @@ PATHS_OPT = {
     "phase1_clean": PHASE1_CLEAN + "/clean_sales.csv"
 }
 
-# === Logging ===
+ALL_DIRS = [INGEST_DIR, PHASE1_CLEAN, PHASE1_PLOTS, PHASE1_LOGS,
+            PHASE2_FEATURES, PHASE2_MODELS, PHASE2_METRICS, PHASE2_LOGS,
+            PHASE2_OPT_FEATURES, PHASE2_OPT_MODELS, PHASE2_OPT_METRICS, PHASE2_OPT_LOGS]
+
 LOG_FILE = os.path.join(PHASE1_LOGS, "pipeling.log")
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.FileHandler(LOG_FILE),
-        logging.StreamHandler()
-    ]
-)
+
+# Nothing above touches the filesystem: importing config is free of side effects.
+# Directories, logging and .env are set up on demand by the helpers below.
+
+def ensure_output_dirs():
+    """Create all output directories if they do not exist."""
+    for path in ALL_DIRS:
+        os.makedirs(path, exist_ok=True)
+
+_LOGGING_READY = False
+
+def setup_logging(log_file: str = LOG_FILE, level=logging.INFO):
+    """Configure console + file logging once per process."""
+    global _LOGGING_READY
+    if _LOGGING_READY:
+        return
+    os.makedirs(os.path.dirname(log_file), exist_ok=True)
+    logging.basicConfig(
+        level=level,
+        format="%(asctime)s - %(levelname)s - %(message)s",
+        handlers=[
+            logging.FileHandler(log_file),
+            logging.StreamHandler()
+        ]
+    )
+    _LOGGING_READY = True
 
 # === Environment variables for DB access ===
-load_dotenv()
-MYSQL_USER = os.getenv("MYSQL_USER")
-MYSQL_PASSWORD = os.getenv("MYSQL_PASSWORD")
-MYSQL_HOST = os.getenv("MYSQL_HOST")
-MYSQL_PORT = os.getenv("MYSQL_PORT")
-MYSQL_DB = os.getenv("MYSQL_DB")
+DB_ENV_KEYS = ("MYSQL_USER", "MYSQL_PASSWORD", "MYSQL_HOST", "MYSQL_PORT", "MYSQL_DB")
+_DB_SETTINGS = None
+
+def db_settings() -> dict:
+    """Read DB credentials from the environment / .env on first use."""
+    global _DB_SETTINGS
+    if _DB_SETTINGS is None:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _DB_SETTINGS = {key: os.getenv(key) for key in DB_ENV_KEYS}
+    return _DB_SETTINGS
 
+def __getattr__(name):
+    # keeps config.MYSQL_USER etc. working without reading .env at import time
+    if name in DB_ENV_KEYS:
+        return db_settings()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,219 @@
+import os
+import json
+import hashlib
+import logging
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+import config
+
+MANIFEST_FILE = "manifest.json"
+WORKBOOK_EXTENSIONS = (".xlsx", ".xlsm", ".xls")
+
+# explicit formats, tried in order; Excel-typed cells skip parsing entirely
+# tried in order; one format is chosen per column, so a sheet is read either
+# month-first or day-first, never a mix of both
+DATE_FORMATS = ("%Y-%m-%d", "%Y-%m-%d %H:%M:%S", "%m/%d/%Y", "%d/%m/%Y")
+TIME_FORMATS = ("%H:%M:%S", "%H:%M")
+
+INT_COLS = ("transaction_id", "transaction_qty", "store_id", "product_id")
+FLOAT_COLS = ("unit_price",)
+# low-cardinality text: dictionary-encoded in the columnar output
+CATEGORY_COLS = ("store_location", "product_category", "product_type", "product_detail")
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+# === vectorized typing ===
+def normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
+    df.columns = [str(c).strip().replace(" ", "_").lower() for c in df.columns]
+    return df
+
+def _parse_with_formats(text: pd.Series, formats: tuple) -> pd.Series:
+    """Fill in each explicit format in turn; rows no format matches stay NaT. Only for unambiguous formats."""
+    out = pd.Series(pd.NaT, index=text.index, dtype="datetime64[ns]")
+    for fmt in formats:
+        todo = out.isna() & text.notna()
+        if not todo.any():
+            break
+        out[todo] = pd.to_datetime(text[todo], format=fmt, errors="coerce")
+    return out
+
+def _parse_single_format(text: pd.Series, formats: tuple) -> pd.Series:
+    """
+    Parse with the first format that matches every non-null value. Raises
+    ValueError if none does, rather than mixing formats row by row (e.g.
+    reading 03/04 as March 4 on one row and 13/04 as April 13 on the next).
+    """
+    present = text.notna()
+    for fmt in formats:
+        out = pd.to_datetime(text, format=fmt, errors="coerce")
+        if out[present].notna().all():
+            return out
+    sample = text[present].head(3).tolist()
+    raise ValueError(f"No single date format in {formats} parses every value, e.g. {sample}")
+
+def parse_dates(values: pd.Series) -> pd.Series:
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.dt.normalize()
+    # few distinct dates per sheet: parse each once and broadcast back
+    codes, uniques = pd.factorize(values)
+    parsed = _parse_single_format(pd.Series(pd.Index(uniques).astype(str)), DATE_FORMATS).to_numpy()
+    return pd.Series(np.append(parsed, np.datetime64("NaT"))[codes], index=values.index, dtype="datetime64[ns]")
+
+def parse_times(values: pd.Series) -> pd.Series:
+    """datetime.time objects, as load_sales_mysql has always written them; parsed once per distinct value."""
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return pd.Series(values.dt.time, index=values.index, dtype=object)
+    codes, uniques = pd.factorize(values)
+    text = pd.Series(pd.Index(uniques).astype(str))
+    parsed = _parse_with_formats(text, TIME_FORMATS)
+    times = np.append(np.array([t.time() if pd.notna(t) else None for t in parsed], dtype=object), None)
+    return pd.Series(times[codes], index=values.index, dtype=object)
+
+def type_sales_frame(df: pd.DataFrame) -> pd.DataFrame:
+    df = normalize_columns(df)
+    if "transaction_date" in df.columns:
+        df["transaction_date"] = parse_dates(df["transaction_date"])
+    if "transaction_time" in df.columns:
+        df["transaction_time"] = parse_times(df["transaction_time"])
+    for col in INT_COLS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype("Int64")
+    for col in FLOAT_COLS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype(np.float64)
+    for col in CATEGORY_COLS:
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+    return df
+
+# === conversion (runs in worker processes) ===
+def convert_workbook(path: str, digest: str, out_dir: str) -> list:
+    """Parse every sheet of one workbook and write one parquet file per sheet."""
+    sheets = pd.read_excel(path, sheet_name=None)
+    outputs = []
+    for i, (name, df) in enumerate(sheets.items()):
+        if df.empty:
+            continue
+        try:
+            df = type_sales_frame(df)
+        except ValueError as e:
+            raise ValueError(f"{path} [{name}]: {e}") from e
+        # content-addressed: a renamed or copied workbook reuses the same files
+        out_path = os.path.join(out_dir, f"{digest[:16]}_{i}.parquet")
+        tmp = out_path + ".tmp"
+        df.to_parquet(tmp, index=False)
+        os.replace(tmp, out_path)
+        outputs.append({"sheet": str(name), "path": out_path, "rows": len(df)})
+    return outputs
+
+# === cache ===
+def load_manifest(out_dir: str) -> dict:
+    path = os.path.join(out_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def save_manifest(manifest: dict, out_dir: str):
+    path = os.path.join(out_dir, MANIFEST_FILE)
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+def list_workbooks(source_dir: str) -> list:
+    return sorted(os.path.join(source_dir, f) for f in os.listdir(source_dir)
+                  if f.lower().endswith(WORKBOOK_EXTENSIONS) and not f.startswith("~$"))
+
+def _cache_hit(entry: dict, st) -> bool:
+    return (entry is not None and entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns
+            and all(os.path.exists(o["path"]) for o in entry["outputs"]))
+
+def prune_outputs(manifest: dict, out_dir: str) -> list:
+    """Delete parquet files in out_dir that no workbook in the manifest references."""
+    referenced = {os.path.abspath(o["path"]) for e in manifest.values() for o in e["outputs"]}
+    removed = []
+    for name in os.listdir(out_dir):
+        path = os.path.abspath(os.path.join(out_dir, name))
+        if name.endswith(".parquet") and path not in referenced:
+            os.remove(path)
+            removed.append(path)
+    return removed
+
+def ingest_directory(source_dir: str = config.DATA_DIR, out_dir: str = config.INGEST_DIR, n_jobs: int = None) -> dict:
+    """
+    Convert every workbook in source_dir to parquet, one worker process per
+    workbook. A workbook whose size and mtime match the manifest is skipped
+    without being read; one whose mtime changed is hashed, and only parsed
+    again if its content hash changed too. Outputs of workbooks that were
+    removed or changed are deleted. Returns the manifest
+    {workbook path: {sha256, size, mtime_ns, outputs}} for current workbooks.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = load_manifest(out_dir)
+    workbooks = list_workbooks(source_dir)
+    current, todo = {}, []
+    for path in workbooks:
+        st = os.stat(path)
+        entry = manifest.get(path)
+        if _cache_hit(entry, st):
+            current[path] = entry
+            continue
+        digest = file_sha256(path)
+        reusable = next((e for e in manifest.values() if e["sha256"] == digest
+                         and all(os.path.exists(o["path"]) for o in e["outputs"])), None)
+        if reusable is not None:
+            current[path] = {**reusable, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+        else:
+            todo.append((path, digest, st))
+
+    if todo:
+        n_jobs = n_jobs or min(len(todo), os.cpu_count() or 1)
+        args = ([p for p, _, _ in todo], [d for _, d, _ in todo], [out_dir] * len(todo))
+        if n_jobs == 1:
+            results = list(map(convert_workbook, *args))
+        else:
+            with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+                results = list(pool.map(convert_workbook, *args))
+        for (path, digest, st), outputs in zip(todo, results):
+            current[path] = {"sha256": digest, "size": st.st_size, "mtime_ns": st.st_mtime_ns, "outputs": outputs}
+    save_manifest(current, out_dir)
+    removed = prune_outputs(current, out_dir)
+    logging.info(f"[OK] Ingested {len(workbooks)} workbooks ({len(todo)} converted, "
+                 f"{len(workbooks) - len(todo)} from cache, {len(removed)} stale outputs removed) -> {out_dir}")
+    return current
+
+def iter_ingested(out_dir: str = config.INGEST_DIR, manifest: dict = None):
+    """
+    Yield one typed DataFrame per converted sheet, e.g. for validate_stream().
+    Identical workbooks share content-addressed outputs; each file is read once.
+    """
+    manifest = manifest if manifest is not None else load_manifest(out_dir)
+    seen = set()
+    for path in sorted(manifest):
+        for out in manifest[path]["outputs"]:
+            if out["path"] in seen:
+                continue
+            seen.add(out["path"])
+            yield pd.read_parquet(out["path"])
+
+def load_ingested(out_dir: str = config.INGEST_DIR, manifest: dict = None) -> pd.DataFrame:
+    frames = list(iter_ingested(out_dir, manifest))
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
+
+def main(source_dir: str = config.DATA_DIR):
+    config.setup_logging()
+    manifest = ingest_directory(source_dir)
+    rows = sum(o["rows"] for o in {o["path"]: o for e in manifest.values() for o in e["outputs"]}.values())
+    print(f"{len(manifest)} workbooks, {rows} rows -> {config.INGEST_DIR}")
+
+if __name__ == "__main__":
+    main()
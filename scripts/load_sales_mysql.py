@@ -1,36 +1,35 @@
-import pandas as pd
-from sqlalchemy import create_engine
-import os
-from dotenv import load_dotenv
+import sys
 
-# === 1. Load Environment Variables ===
-load_dotenv()
+import config
+from ingest_sales_workbooks import ingest_directory, load_ingested
 
-username = os.getenv("MYSQL_USER")
-password = os.getenv("MYSQL_PASSWORD")
-host = os.getenv("MYSQL_HOST")
-port = os.getenv("MYSQL_PORT")
-database = os.getenv("MYSQL_DB")
+# === 1. Source: a directory of POS workbooks (one per store or month) ===
+# Workbooks are converted to typed parquet in parallel by ingest_sales_workbooks
+# and cached by file hash / mtime, so unchanged files are never parsed again.
+# transaction_date / transaction_time arrive already typed (date, time).
+def main(source_dir: str = config.DATA_DIR):
+    config.setup_logging()
 
-# === 2. Load Excel ===
-excel_file = r"C:\Users\vahid\Projects\CoffeeSalesCaseStudy\data\Coffee-Shop-Sales.xlsx"
-df = pd.read_excel(excel_file)
+    # === 2. Load Workbooks (via the parquet cache) ===
+    manifest = ingest_directory(source_dir)
+    df = load_ingested(manifest=manifest)
+    if df.empty or "transaction_date" not in df.columns:
+        raise ValueError(f"No sales rows found in workbooks under {source_dir} ({len(manifest)} workbooks); "
+                         "MySQL table 'sales' left unchanged")
 
-# === Clean Column Name ===
-df.columns = [c.strip().replace(" ", "_").lower() for c in df.columns]
+    # === Fixing Date type before exporting this into MySQL ===
+    df["transaction_date"] = df["transaction_date"].dt.date
 
-# === Fixing Date and Time type before exporting this into MySQL ===
-df["transaction_date"] = pd.to_datetime(df["transaction_date"]).dt.date
-df["transaction_time"] = pd.to_datetime(df["transaction_time"], format="%H:%M:%S").dt.time
+    # ---------------------------------
+    print("Connecting to MySQL...")
+    # === 3. Connect to MySQL ===
+    from utils import get_db_connection
+    engine = get_db_connection()
 
-# ---------------------------------
-print("Connecting to MySQL...")
-# === 3. Connect to MySQL ===
+    # === 4. Load data ===
+    df.to_sql("sales", engine, if_exists="replace", index=False, chunksize=1000)
 
-engine = create_engine(f"mysql+pymysql://{username}:{password}@{host}:{port}/{database}")
+    print(f"DATA LOADED SUCCESSFULLY INTO MYSQL ({len(df)} rows from {len(manifest)} workbooks in {source_dir})")
 
-# === 4. Load data ===
-
-df.to_sql("sales", engine, if_exists="replace", index=False, chunksize=1000)
-
-print("DATA LOADED SUCCESSFULLY INTO MYSQL")
\ No newline at end of file
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else config.DATA_DIR)
@@ -0,0 +1,221 @@
+import logging
+from datetime import datetime, timezone
+
+import config
+
+SOURCE_TABLE = "sales"
+TARGET_TABLE = "sales_cleaned"
+WATERMARK_TABLE = "etl_watermarks"
+JOB_NAME = "sales_cleaned"
+BATCH_SIZE = 50_000
+# ids at or just below the watermark are cleaned again on every run, so lines
+# added to a recent basket and corrections to recent rows are picked up
+# (sql/cleaning.sql uses the same window)
+LOOKBACK_IDS = 1_000
+
+COLUMNS = ("transaction_id", "transaction_date", "transaction_time", "transaction_qty", "store_id",
+           "store_location", "product_id", "unit_price", "product_category", "product_type", "product_detail")
+
+# same rules as sql/cleaning.sql
+CLEAN_SELECT = f"""
+SELECT transaction_id,
+    transaction_date,
+    transaction_time,
+    COALESCE(transaction_qty, 0) AS transaction_qty,
+    store_id,
+    TRIM(COALESCE(store_location, 'Unknown')) AS store_location,
+    product_id,
+    unit_price,
+    UPPER(TRIM(COALESCE(product_category, 'Unknown'))) AS product_category,
+    UPPER(TRIM(COALESCE(product_type, 'Unknown'))) AS product_type,
+    TRIM(COALESCE(product_detail, 'Unknown')) AS product_detail
+FROM {SOURCE_TABLE}
+WHERE transaction_id > :lo AND transaction_id <= :hi
+"""
+
+TARGET_DDL = f"""
+CREATE TABLE IF NOT EXISTS {TARGET_TABLE} (
+    transaction_id INT NOT NULL,
+    transaction_date DATE,
+    transaction_time TIME,
+    transaction_qty INT,
+    store_id INT,
+    store_location VARCHAR(100),
+    product_id INT,
+    unit_price FLOAT,
+    product_category VARCHAR(100),
+    product_type VARCHAR(100),
+    product_detail VARCHAR(100)
+)
+"""
+
+WATERMARK_DDL = f"""
+CREATE TABLE IF NOT EXISTS {WATERMARK_TABLE} (
+    job VARCHAR(50) NOT NULL PRIMARY KEY,
+    high_water BIGINT NOT NULL,
+    updated_at VARCHAR(32)
+)
+"""
+
+# index name -> (unique, [(column, MySQL prefix length or None)]); mirrors sql/optimization.sql.
+# A transaction_id is a basket with one line per product, so the upsert keys on
+# the unique (transaction_id, product_id) index.
+UPSERT_KEY = ("transaction_id", "product_id")
+EXPECTED_INDEXES = {
+    "idx_transaction_id": (False, [("transaction_id", None)]),
+    "idx_store_location": (False, [("store_location", 50)]),
+    "idx_store_type": (False, [("store_location", 50), ("product_type", 50)]),
+    "idx_product_detail": (False, [("product_detail", 50)]),
+    "idx_product_type": (False, [("product_type", 50)]),
+    "idx_transaction_date": (False, [("transaction_date", None)]),
+    "idx_product_date": (False, [("product_id", None), ("transaction_date", None)]),
+    "idx_transaction_product": (True, [("transaction_id", None), ("product_id", None)]),
+}
+
+def _is_mysql(engine) -> bool:
+    return engine.dialect.name in ("mysql", "mariadb")
+
+def upsert_sql(engine) -> str:
+    """INSERT ... SELECT with the dialect's upsert clause (MySQL/MariaDB or SQLite)."""
+    cols = ", ".join(COLUMNS)
+    updates = [c for c in COLUMNS if c not in UPSERT_KEY]
+    if _is_mysql(engine):
+        # VALUES() rather than the 8.0.19 row alias so MariaDB accepts it too
+        clause = "ON DUPLICATE KEY UPDATE " + ", ".join(f"{c} = VALUES({c})" for c in updates)
+    else:
+        clause = (f"ON CONFLICT({', '.join(UPSERT_KEY)}) DO UPDATE SET "
+                  + ", ".join(f"{c} = excluded.{c}" for c in updates))
+    return f"INSERT INTO {TARGET_TABLE} ({cols}) {CLEAN_SELECT} {clause}"
+
+def _index_parts(engine, name: str) -> str:
+    mysql = _is_mysql(engine)
+    return ", ".join(f"{c}({n})" if n and mysql else c for c, n in EXPECTED_INDEXES[name][1])
+
+def index_ddl(engine, name: str) -> str:
+    unique = EXPECTED_INDEXES[name][0]
+    return f"CREATE {'UNIQUE ' if unique else ''}INDEX {name} ON {TARGET_TABLE}({_index_parts(engine, name)})"
+
+def rebuild_index_ddl(engine, name: str) -> list:
+    """Statements that replace an existing index with its expected definition."""
+    unique = EXPECTED_INDEXES[name][0]
+    if _is_mysql(engine):
+        # one ALTER, so a failed unique build leaves the old index in place
+        return [f"ALTER TABLE {TARGET_TABLE} DROP INDEX {name}, "
+                f"ADD {'UNIQUE ' if unique else ''}INDEX {name} ({_index_parts(engine, name)})"]
+    return [f"DROP INDEX {name}", index_ddl(engine, name)]
+
+# === schema ===
+def check_indexes(engine) -> tuple:
+    """
+    (missing, mismatched) expected index names. An index is mismatched when
+    its uniqueness or column list differs from EXPECTED_INDEXES, e.g. a
+    non-unique idx_transaction_product left by an older optimization.sql.
+    """
+    from sqlalchemy import inspect
+    existing = {ix["name"]: ix for ix in inspect(engine).get_indexes(TARGET_TABLE)}
+    missing, mismatched = [], []
+    for name, (unique, cols) in EXPECTED_INDEXES.items():
+        ix = existing.get(name)
+        if ix is None:
+            missing.append(name)
+        elif bool(ix["unique"]) != unique or list(ix["column_names"]) != [c for c, _ in cols]:
+            mismatched.append(name)
+    return missing, mismatched
+
+def ensure_schema(engine):
+    """
+    Create sales_cleaned, the watermark table and any missing index, and
+    rebuild indexes whose definition differs from EXPECTED_INDEXES. Never
+    drops the table. Raises RuntimeError if an index cannot be rebuilt, e.g.
+    a unique one over rows that already hold duplicate keys.
+    """
+    from sqlalchemy import text
+    with engine.begin() as conn:
+        conn.execute(text(TARGET_DDL))
+        conn.execute(text(WATERMARK_DDL))
+    missing, mismatched = check_indexes(engine)
+    for name in missing:
+        with engine.begin() as conn:
+            conn.execute(text(index_ddl(engine, name)))
+        logging.info(f"[OK] Created index {name} on {TARGET_TABLE}.")
+    for name in mismatched:
+        try:
+            with engine.begin() as conn:
+                for stmt in rebuild_index_ddl(engine, name):
+                    conn.execute(text(stmt))
+        except Exception as e:
+            raise RuntimeError(f"Could not rebuild index {name} on {TARGET_TABLE} as {EXPECTED_INDEXES[name]}; "
+                               f"remove duplicate {UPSERT_KEY} rows and re-run: {e}") from e
+        logging.info(f"[OK] Rebuilt index {name} on {TARGET_TABLE} to its expected definition.")
+
+def verify_indexes(engine):
+    missing, mismatched = check_indexes(engine)
+    if missing or mismatched:
+        raise RuntimeError(f"{TARGET_TABLE} indexes do not match EXPECTED_INDEXES: "
+                           f"missing {missing}, wrong unique/columns {mismatched}")
+    logging.info(f"[OK] All {len(EXPECTED_INDEXES)} expected indexes present on {TARGET_TABLE}.")
+
+# === watermark ===
+def get_watermark(conn, job: str = JOB_NAME) -> int:
+    from sqlalchemy import text
+    row = conn.execute(text(f"SELECT high_water FROM {WATERMARK_TABLE} WHERE job = :job"), {"job": job}).first()
+    return int(row[0]) if row else 0
+
+def set_watermark(conn, high_water: int, job: str = JOB_NAME):
+    from sqlalchemy import text
+    params = {"job": job, "hw": int(high_water), "ts": datetime.now(timezone.utc).isoformat(timespec="seconds")}
+    updated = conn.execute(text(f"UPDATE {WATERMARK_TABLE} SET high_water = :hw, updated_at = :ts WHERE job = :job"),
+                           params)
+    if updated.rowcount == 0:
+        conn.execute(text(f"INSERT INTO {WATERMARK_TABLE} (job, high_water, updated_at) VALUES (:job, :hw, :ts)"),
+                     params)
+
+# === job ===
+def run_cleaning_job(engine=None, batch_size: int = BATCH_SIZE, full_refresh: bool = False,
+                     lookback: int = LOOKBACK_IDS) -> dict:
+    """
+    Clean rows of `sales` with transaction_id above the stored watermark
+    minus `lookback` and upsert them into the persistent sales_cleaned table
+    on (transaction_id, product_id), one id range per transaction; the
+    watermark moves in the same transaction as its batch, so an interrupted
+    run resumes where it stopped. Re-cleaning the lookback window is
+    idempotent.
+
+    full_refresh=True re-cleans every row (e.g. after the rules change, or
+    corrections older than the lookback window) without dropping the table
+    or its indexes.
+    """
+    from sqlalchemy import text
+    from utils import get_db_connection
+    engine = engine or get_db_connection()
+    ensure_schema(engine)
+    verify_indexes(engine)
+    upsert = text(upsert_sql(engine))
+    next_hi = text(f"SELECT MAX(transaction_id) FROM (SELECT transaction_id FROM {SOURCE_TABLE} "
+                   "WHERE transaction_id > :lo ORDER BY transaction_id LIMIT :n) batch")
+
+    with engine.begin() as conn:
+        if full_refresh:
+            set_watermark(conn, 0)
+        previous = get_watermark(conn)
+    start = max(previous - lookback, 0)
+    lo, rows, batches = start, 0, 0
+    while True:
+        with engine.begin() as conn:
+            hi = conn.execute(next_hi, {"lo": lo, "n": batch_size}).scalar()
+            if hi is None:
+                break
+            rows += conn.execute(upsert, {"lo": lo, "hi": hi}).rowcount
+            set_watermark(conn, hi)
+        lo, batches = hi, batches + 1
+    watermark = max(lo, previous)
+    logging.info(f"[OK] Cleaned {SOURCE_TABLE} ids ({start}, {watermark}] into {TARGET_TABLE} in {batches} batches.")
+    return {"start": start, "watermark": watermark, "batches": batches, "rows_affected": rows}
+
+def main():
+    config.setup_logging()
+    stats = run_cleaning_job()
+    print(f"{TARGET_TABLE} up to transaction_id {stats['watermark']} ({stats['batches']} batches)")
+
+if __name__ == "__main__":
+    main()
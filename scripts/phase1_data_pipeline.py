@@ -1,18 +1,26 @@
 import os
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-from sqlalchemy import create_engine
-from dotenv import load_dotenv
 import logging
 import config
 from utils import get_db_connection, safe_save_plot, save_dataframe
+from phase1_validation import DataValidator, DataValidationError, validate_stream, CHUNK_SIZE
 
 # === 1. Load Data ===
-def load_data():
+def load_data(validator: DataValidator = None, chunksize: int = CHUNK_SIZE):
+    """Stream the sales table in chunks, validating each one as it arrives."""
     logging.info("[START] Loading data from MySQL...")
     engine = get_db_connection()
-    df = pd.read_sql("SELECT * FROM sales", con=engine)
+    chunks = pd.read_sql("SELECT * FROM sales", con=engine, chunksize=chunksize)
+    df = validate_stream(chunks, validator=validator)
+    logging.info(f"[OK] Data loaded: {df.shape[0]} rows, {df.shape[1]} columns.")
+    return df
+
+def load_ingested_data(source_dir: str = config.DATA_DIR, validator: DataValidator = None):
+    """Read POS workbooks through the parquet cache (no database), one validated chunk per sheet."""
+    from ingest_sales_workbooks import ingest_directory, iter_ingested
+    logging.info(f"[START] Loading workbooks from {source_dir}...")
+    manifest = ingest_directory(source_dir)
+    df = validate_stream(iter_ingested(manifest=manifest), validator=validator)
     logging.info(f"[OK] Data loaded: {df.shape[0]} rows, {df.shape[1]} columns.")
     return df
 
@@ -42,6 +50,8 @@ def clean_transform(df: pd.DataFrame) -> pd.DataFrame:
 
 # === 3. EDA Plots ===
 def plot_eda(df: pd.DataFrame):
+    import matplotlib.pyplot as plt
+    import seaborn as sns
     logging.info("[START] Generating plots...")
 
     if "transaction_date" in df.columns and "revenue" in df.columns:
@@ -95,14 +105,30 @@ def export_results(df: pd.DataFrame):
     )
 
 # === 5. Main ===
-def run_pipeline():
+def run_pipeline(source: str = "mysql", source_dir: str = config.DATA_DIR, date_min=None, date_max=None,
+                 thresholds: dict = None, fail_fast: bool = True):
+    """
+    date_min / date_max bound transaction_date for the date-range check;
+    thresholds overrides DEFAULT_THRESHOLDS per check name. A failed check
+    raises DataValidationError before anything is exported, so the previous
+    clean_sales.csv is never replaced with, or mistaken for, a bad load.
+    """
+    config.setup_logging()
+    config.ensure_output_dirs()
     logging.info("[START] Phase 1 Data Pipeline...")
+    validator = DataValidator(thresholds=thresholds, date_min=date_min, date_max=date_max, fail_fast=fail_fast)
     try:
-        df = load_data()
+        if source == "workbooks":
+            df = load_ingested_data(source_dir, validator=validator)
+        else:
+            df = load_data(validator=validator)
         df = clean_transform(df)
         plot_eda(df)
         export_results(df)
         logging.info("[OK] Phase 1 completed successfully.")
+    except DataValidationError as e:
+        logging.critical(f"[FAIL] Data validation failed, nothing exported: {e}")
+        raise
     except Exception as e:
         logging.critical(f"[FAIL] Pipeline failed: {e}")
 
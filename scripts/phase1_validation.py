@@ -0,0 +1,259 @@
+import os
+import json
+import logging
+import numpy as np
+import pandas as pd
+
+import config
+
+VALIDATION_REPORT = os.path.join(config.PHASE1_LOGS, "validation_report.json")
+CHUNK_SIZE = 50_000
+
+# column -> expected kind; mirrors the Sales table in sql/set-cafedb.sql
+SCHEMA = {
+    "transaction_id": "integer",
+    "transaction_date": "date",
+    "transaction_time": "time",
+    "transaction_qty": "numeric",
+    "store_id": "integer",
+    "store_location": "text",
+    "product_id": "integer",
+    "unit_price": "numeric",
+    "product_category": "text",
+    "product_type": "text",
+    "product_detail": "text",
+}
+KEY_COLS = ("transaction_id", "transaction_date", "store_id", "product_id")
+POSITIVE_COLS = ("transaction_qty", "unit_price")
+
+# allowed values, compared after TRIM/UPPER as in sql/cleaning.sql
+CATEGORY_DOMAINS = {
+    "store_location": {"ASTORIA", "HELL'S KITCHEN", "LOWER MANHATTAN"},
+    "product_category": {"BAKERY", "BRANDED", "COFFEE", "COFFEE BEANS", "DRINKING CHOCOLATE",
+                         "FLAVOURS", "LOOSE TEA", "PACKAGED CHOCOLATE", "TEA"},
+}
+
+# maximum share of rows allowed to fail each check before the load is rejected
+DEFAULT_THRESHOLDS = {
+    # transaction_id is a basket, so only a repeated (transaction_id, product_id) line is a duplicate
+    "duplicate_line": 0.0,
+    "missing_key": 0.001,
+    "non_positive_qty_price": 0.001,
+    "bad_type": 0.001,
+    "date_out_of_range": 0.0,
+    "unknown_category": 0.01,
+}
+N_EXAMPLES = 5
+
+class DataValidationError(ValueError):
+    """Raised when a check exceeds its threshold; carries the report so far."""
+
+    def __init__(self, message: str, report: dict):
+        super().__init__(message)
+        self.report = report
+
+class DataValidator:
+    """
+    Streaming version of the checks in sql/validation.sql plus schema and
+    category-domain checks. Each chunk is checked in one vectorized pass;
+    (transaction_id, product_id) lines seen so far are kept as a sorted array
+    of packed keys, so duplicates are found across chunk boundaries with a
+    searchsorted lookup and a merge.
+
+    With fail_fast=True a DataValidationError is raised as soon as a check's
+    running failure rate exceeds its threshold.
+    """
+
+    def __init__(self, thresholds: dict = None, date_min=None, date_max=None, fail_fast: bool = True,
+                 domains: dict = None):
+        thresholds = dict(thresholds or {})
+        unknown = sorted(set(thresholds) - set(DEFAULT_THRESHOLDS))
+        if unknown:
+            raise ValueError(f"Unknown validation checks {unknown}, expected some of {sorted(DEFAULT_THRESHOLDS)}")
+        self.thresholds = {**DEFAULT_THRESHOLDS, **{k: float(v) for k, v in thresholds.items()}}
+        self.date_min = pd.Timestamp(date_min) if date_min is not None else None
+        self.date_max = pd.Timestamp(date_max) if date_max is not None else None
+        self.fail_fast = fail_fast
+        self.domains = CATEGORY_DOMAINS if domains is None else domains
+        self.rows = 0
+        self.chunks = 0
+        self.counts = dict.fromkeys(self.thresholds, 0)
+        self.examples = {name: [] for name in self.thresholds}
+        self.unknown_values = {col: set() for col in self.domains}
+        self.missing_columns = []
+        self.observed_min = None
+        self.observed_max = None
+        self._seen_lines = np.empty(0, dtype=np.int64)
+
+    # === per-chunk checks ===
+    def _flag(self, name: str, mask: np.ndarray, ids: np.ndarray):
+        n = int(mask.sum())
+        if n:
+            self.counts[name] += n
+            room = N_EXAMPLES - len(self.examples[name])
+            if room > 0:
+                self.examples[name].extend(ids[mask][:room].tolist())
+
+    def _check_schema(self, chunk: pd.DataFrame):
+        self.missing_columns = [c for c in SCHEMA if c not in chunk.columns]
+        if self.missing_columns:
+            raise DataValidationError(f"Missing columns: {self.missing_columns}", self.report())
+
+    def _check_duplicates(self, ids: np.ndarray, product_ids: np.ndarray, valid: np.ndarray):
+        ids = ids[valid]
+        # one int64 per line: transaction_id in the high 32 bits, product_id in the low 32
+        lines = (ids << 32) | (product_ids[valid] & 0xFFFFFFFF)
+        uniq, first = np.unique(lines, return_index=True)
+        dup = np.zeros(lines.size, dtype=bool)
+        dup[np.setdiff1d(np.arange(lines.size), first)] = True  # repeats within the chunk
+        pos = np.searchsorted(self._seen_lines, uniq)
+        pos = np.minimum(pos, max(self._seen_lines.size - 1, 0))
+        seen_before = (self._seen_lines[pos] == uniq) if self._seen_lines.size else np.zeros(uniq.size, dtype=bool)
+        dup[first[seen_before]] = True  # first occurrence in this chunk, but seen in an earlier one
+        self._flag("duplicate_line", dup, ids)
+        # both inputs are sorted, so the stable sort only merges two runs
+        self._seen_lines = np.sort(np.concatenate([self._seen_lines, uniq[~seen_before]]), kind="stable")
+
+    def validate_chunk(self, chunk: pd.DataFrame) -> pd.DataFrame:
+        """Run every check on one chunk and return it with normalized column names."""
+        chunk = chunk.rename(columns=lambda c: str(c).strip().replace(" ", "_").lower())
+        if self.chunks == 0:
+            self._check_schema(chunk)
+        n = len(chunk)
+        self.rows += n
+        self.chunks += 1
+
+        raw_ids = chunk["transaction_id"]
+        id_num = pd.to_numeric(raw_ids, errors="coerce").to_numpy(dtype=np.float64)
+        report_ids = np.where(np.isnan(id_num), -1, id_num).astype(np.int64)
+
+        # missing keys (NULLs only; unparseable values are counted as bad types)
+        missing = np.zeros(n, dtype=bool)
+        for col in KEY_COLS:
+            missing |= chunk[col].isna().to_numpy()
+        self._flag("missing_key", missing, report_ids)
+
+        # type checks: a non-null value that does not parse as its schema kind
+        bad_type = np.zeros(n, dtype=bool)
+        parsed = {}
+        for col, kind in SCHEMA.items():
+            values = chunk[col]
+            if kind in ("integer", "numeric"):
+                parsed[col] = pd.to_numeric(values, errors="coerce").to_numpy(dtype=np.float64)
+                bad = np.isnan(parsed[col]) & values.notna().to_numpy()
+                if kind == "integer":
+                    bad |= np.isfinite(parsed[col]) & (parsed[col] != np.round(parsed[col]))
+            elif kind == "date":
+                parsed[col] = pd.to_datetime(values, errors="coerce")
+                bad = parsed[col].isna().to_numpy() & values.notna().to_numpy()
+            elif kind == "time":
+                # a day has at most 86,400 distinct times: parse each distinct value once
+                codes, uniques = pd.factorize(values)
+                bad_unique = pd.to_timedelta(pd.Index(uniques).astype(str), errors="coerce").isna()
+                bad = np.append(np.asarray(bad_unique), False)[codes]
+            else:
+                continue
+            bad_type |= bad
+        self._flag("bad_type", bad_type, report_ids)
+
+        product_num = parsed["product_id"]
+        valid_line = ~np.isnan(id_num) & ~np.isnan(product_num)
+        self._check_duplicates(report_ids, np.where(valid_line, product_num, -1).astype(np.int64), valid_line)
+
+        non_positive = np.zeros(n, dtype=bool)
+        for col in POSITIVE_COLS:
+            non_positive |= parsed[col] <= 0  # NaN compares False, so nulls are not double-counted
+        self._flag("non_positive_qty_price", non_positive, report_ids)
+
+        dates = parsed["transaction_date"]
+        if dates.notna().any():
+            lo, hi = dates.min(), dates.max()
+            self.observed_min = lo if self.observed_min is None else min(self.observed_min, lo)
+            self.observed_max = hi if self.observed_max is None else max(self.observed_max, hi)
+        out_of_range = np.zeros(n, dtype=bool)
+        if self.date_min is not None:
+            out_of_range |= (dates < self.date_min).to_numpy()
+        if self.date_max is not None:
+            out_of_range |= (dates > self.date_max).to_numpy()
+        self._flag("date_out_of_range", out_of_range, report_ids)
+
+        unknown = np.zeros(n, dtype=bool)
+        for col, allowed in self.domains.items():
+            codes, uniques = pd.factorize(chunk[col])
+            normalized = pd.Index(uniques).astype(str).str.strip().str.upper()
+            bad_unique = ~normalized.isin(allowed)
+            bad = np.append(bad_unique, False)[codes]  # code -1 (null) maps to the trailing False
+            if bad.any():
+                self.unknown_values[col].update(normalized[bad_unique].tolist())
+            unknown |= bad
+        self._flag("unknown_category", unknown, report_ids)
+
+        if self.fail_fast:
+            self.raise_on_failure()
+        return chunk
+
+    # === report ===
+    def failed_checks(self) -> list:
+        return [name for name, count in self.counts.items()
+                if self.rows and count / self.rows > self.thresholds[name]]
+
+    def raise_on_failure(self):
+        failed = self.failed_checks()
+        if failed:
+            summary = ", ".join(f"{name}={self.counts[name]}" for name in failed)
+            raise DataValidationError(f"Data validation failed after {self.rows} rows: {summary}", self.report())
+
+    def report(self) -> dict:
+        checks = {
+            name: {
+                "count": self.counts[name],
+                "rate": self.counts[name] / self.rows if self.rows else 0.0,
+                "threshold": self.thresholds[name],
+                "passed": not self.rows or self.counts[name] / self.rows <= self.thresholds[name],
+                "example_ids": self.examples[name],
+            }
+            for name in self.thresholds
+        }
+        return {
+            "rows": self.rows,
+            "chunks": self.chunks,
+            "missing_columns": self.missing_columns,
+            "date_min": None if self.observed_min is None else str(self.observed_min.date()),
+            "date_max": None if self.observed_max is None else str(self.observed_max.date()),
+            "unknown_categories": {col: sorted(v) for col, v in self.unknown_values.items() if v},
+            "checks": checks,
+            "passed": not self.missing_columns and all(c["passed"] for c in checks.values()),
+        }
+
+def save_report(report: dict, path: str = VALIDATION_REPORT):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+    logging.info(f"[OK] Validation report saved: {path}")
+
+def validate_stream(chunks, validator: DataValidator = None, report_path: str = VALIDATION_REPORT) -> pd.DataFrame:
+    """
+    Validate an iterable of DataFrame chunks (e.g. pd.read_sql(..., chunksize=...))
+    and return them concatenated. The report is written even when a check fails.
+    """
+    validator = validator or DataValidator()
+    parts = []
+    try:
+        for chunk in chunks:
+            parts.append(validator.validate_chunk(chunk))
+        validator.raise_on_failure()
+    finally:
+        report = validator.report()
+        save_report(report, report_path)
+    logging.info(f"[OK] Validated {report['rows']} rows in {report['chunks']} chunks.")
+    return pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=list(SCHEMA))
+
+def main(date_min=None, date_max=None, thresholds=None):
+    config.setup_logging()
+    path = os.path.join(config.PHASE1_CLEAN, "clean_sales.csv")
+    validator = DataValidator(thresholds=thresholds, date_min=date_min, date_max=date_max)
+    validate_stream(pd.read_csv(path, chunksize=CHUNK_SIZE), validator=validator)
+    print(f"Validation passed -> {VALIDATION_REPORT}")
+
+if __name__ == "__main__":
+    main()
@@ -14,10 +14,11 @@ def evaluate_forecast(y_true, y_pred):
     return {"RMSE": rmse, "MAE": mae, "MAPE": mape}
 
 # Churn / classification evaluation
-def evaluate_classification(y_true, y_pred):
+def evaluate_classification(y_true, y_pred, y_score=None):
+    # ROC AUC needs scores; hard 0/1 predictions collapse the curve to one point
     return {
         "accuracy": accuracy_score(y_true, y_pred),
-        "roc_auc": roc_auc_score(y_true, y_pred),
+        "roc_auc": roc_auc_score(y_true, y_pred if y_score is None else y_score),
         "f1_score": f1_score(y_true, y_pred)
     }
 
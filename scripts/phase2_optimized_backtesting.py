@@ -0,0 +1,125 @@
+import os
+import logging
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+from config import PATHS_OPT as PATHS
+from utils import ensure_dir, save_csv
+
+BACKTEST_FILE = os.path.join(PATHS["metrics"], "backtest_by_horizon.csv")
+BACKTEST_FOLDS_FILE = os.path.join(PATHS["metrics"], "backtest_folds.csv")
+
+# prepared series shared with worker processes; set once per worker by _init_worker
+_SERIES = None
+
+def rolling_origin_cutoffs(n_obs: int, horizon: int = 30, n_splits: int = 3, initial: int = None,
+                           period: int = None) -> list:
+    """
+    Training-set lengths for rolling-origin folds. The last fold ends at the
+    last observation; earlier ones step back by `period` (default: horizon).
+    Folds whose training set would be shorter than `initial` are dropped.
+    """
+    period = period or horizon
+    initial = initial or max(2 * horizon, 28)
+    cutoffs = [n_obs - horizon - i * period for i in reversed(range(n_splits))]
+    kept = [c for c in cutoffs if c >= initial]
+    if len(kept) < len(cutoffs):
+        logging.warning(f"[WARN] Dropped {len(cutoffs) - len(kept)} backtest folds with < {initial} training days.")
+    if not kept:
+        raise ValueError(f"Series of {n_obs} days is too short for horizon={horizon}, initial={initial}")
+    return kept
+
+def _init_worker(ds: np.ndarray, y: np.ndarray):
+    global _SERIES
+    _SERIES = (ds, y)
+
+def _run_fold(cutoff: int, backend: str, horizon: int) -> pd.DataFrame:
+    from phase2_optimized_forecasting import forecast_with_backend
+    ds, y = _SERIES
+    train = pd.DataFrame({"ds": ds[:cutoff], "y": y[:cutoff]})
+    pred = forecast_with_backend(train, backend=backend, periods=horizon)
+    pred = pred[pred["ds"] > ds[cutoff - 1]].head(horizon)
+    actual = y[cutoff:cutoff + horizon]
+    n = min(len(actual), len(pred))
+    return pd.DataFrame({
+        "cutoff": ds[cutoff - 1],
+        "horizon": np.arange(1, n + 1),
+        "ds": pred["ds"].to_numpy()[:n],
+        "y": actual[:n],
+        "yhat": pred["yhat"].to_numpy()[:n],
+    })
+
+def horizon_metrics(folds: pd.DataFrame) -> pd.DataFrame:
+    """RMSE / MAE / MAPE per forecast step, pooled over folds."""
+    err = folds["yhat"] - folds["y"]
+    nonzero = folds["y"] != 0
+    tmp = pd.DataFrame({
+        "horizon": folds["horizon"],
+        "sq": err ** 2,
+        "abs": err.abs(),
+        "ape": (err.abs() / folds["y"].abs()).where(nonzero) * 100,
+    })
+    g = tmp.groupby("horizon")
+    return pd.DataFrame({
+        "rmse": np.sqrt(g["sq"].mean()),
+        "mae": g["abs"].mean(),
+        "mape": g["ape"].mean(),
+        "n_folds": g.size(),
+    }).reset_index()
+
+def backtest(ts: pd.DataFrame, backend: str = "holt_winters", horizon: int = 30, n_splits: int = 3,
+             initial: int = None, period: int = None, n_jobs: int = None):
+    """
+    Rolling-origin backtest of any forecast_with_backend() backend on a
+    prepare_forecast_df() frame. The series is put on a daily grid once and
+    handed to each worker process at start-up; folds only carry their cutoff.
+    Returns (by_horizon, folds).
+    """
+    s = ts.set_index(pd.to_datetime(ts["ds"]))["y"].asfreq("D", fill_value=0)
+    ds, y = s.index.to_numpy(), s.to_numpy(dtype=np.float64)
+    cutoffs = rolling_origin_cutoffs(len(y), horizon=horizon, n_splits=n_splits, initial=initial, period=period)
+    n_jobs = n_jobs or min(len(cutoffs), os.cpu_count() or 1)
+    if n_jobs == 1:
+        _init_worker(ds, y)
+        results = [_run_fold(c, backend, horizon) for c in cutoffs]
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker, initargs=(ds, y)) as pool:
+            results = list(pool.map(_run_fold, cutoffs, [backend] * len(cutoffs), [horizon] * len(cutoffs)))
+    folds = pd.concat(results, ignore_index=True)
+    folds.insert(0, "backend", backend)
+    by_horizon = horizon_metrics(folds)
+    by_horizon.insert(0, "backend", backend)
+    return by_horizon, folds
+
+def summarize_backtest(by_horizon: pd.DataFrame) -> dict:
+    """Horizon-averaged out-of-sample metrics for the metrics export."""
+    return {
+        "backtest_rmse": float(by_horizon["rmse"].mean()),
+        "backtest_mae": float(by_horizon["mae"].mean()),
+        "backtest_mape": float(by_horizon["mape"].mean()),
+    }
+
+def export_backtest(by_horizon: pd.DataFrame, folds: pd.DataFrame = None):
+    ensure_dir(PATHS["metrics"])
+    save_csv(by_horizon, BACKTEST_FILE)
+    if folds is not None:
+        save_csv(folds, BACKTEST_FOLDS_FILE)
+
+def main():
+    from phase2_optimized_forecasting import prepare_forecast_df, FORECAST_BACKENDS
+    raw = pd.read_csv(PATHS["phase1_clean"], parse_dates=["transaction_date"])
+    ts = prepare_forecast_df(raw)
+    tables = []
+    for backend in FORECAST_BACKENDS:
+        try:
+            by_horizon, _ = backtest(ts, backend=backend, horizon=30, n_splits=3)
+        except ImportError as e:
+            logging.warning(f"[WARN] Skipping backend {backend}: {e}")
+            continue
+        tables.append(by_horizon)
+    export_backtest(pd.concat(tables, ignore_index=True))
+    print(f"Backtest metrics saved -> {BACKTEST_FILE}")
+
+if __name__ == "__main__":
+    main()
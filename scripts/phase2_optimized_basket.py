@@ -0,0 +1,201 @@
+import os
+from collections import Counter, defaultdict
+from itertools import combinations
+import numpy as np
+import pandas as pd
+
+from config import PATHS_OPT as PATHS
+from utils import ensure_dir, save_csv
+
+MODEL_DIR = PATHS["models"]
+RULES_FILE = os.path.join(MODEL_DIR, "basket_rules.csv")
+BASKET_RECS_FILE = os.path.join(MODEL_DIR, "basket_recommendations.csv")
+
+RULE_COLUMNS = ["antecedent", "consequent", "support", "confidence", "lift", "count"]
+
+def build_basket_matrix(df: pd.DataFrame, basket_col: str = "transaction_id", item_col: str = "product_id"):
+    """
+    Sparse basket × item incidence matrix (1 if the item is in the basket).
+    Returns (matrix, item_ids).
+    """
+    from scipy.sparse import csr_matrix
+    basket_codes, _ = pd.factorize(df[basket_col])
+    item_codes, item_ids = pd.factorize(df[item_col], sort=True)
+    keep = (basket_codes >= 0) & (item_codes >= 0)
+    data = np.ones(int(keep.sum()), dtype=np.int8)
+    matrix = csr_matrix((data, (basket_codes[keep], item_codes[keep])),
+                        shape=(int(basket_codes.max()) + 1, len(item_ids)))
+    # repeated lines of the same product in one basket count once
+    matrix.data[:] = 1
+    return matrix, list(item_ids)
+
+# === FP-tree ===
+class _FPNode:
+    __slots__ = ("item", "count", "parent", "children")
+
+    def __init__(self, item, parent):
+        self.item = item
+        self.count = 0
+        self.parent = parent
+        self.children = {}
+
+def _build_fp_tree(transactions, min_count: int):
+    """
+    transactions: iterable of (items, count). Returns (header, item_counts)
+    where header maps each frequent item to its list of tree nodes.
+    """
+    item_counts = defaultdict(int)
+    for items, count in transactions:
+        for item in items:
+            item_counts[item] += count
+    item_counts = {i: c for i, c in item_counts.items() if c >= min_count}
+    if not item_counts:
+        return {}, item_counts
+    # most frequent items sit nearest the root so paths share prefixes
+    order = {item: rank for rank, item in enumerate(sorted(item_counts, key=lambda i: (-item_counts[i], i)))}
+    root = _FPNode(None, None)
+    header = defaultdict(list)
+    for items, count in transactions:
+        path = sorted((i for i in items if i in order), key=order.__getitem__)
+        node = root
+        for item in path:
+            child = node.children.get(item)
+            if child is None:
+                child = _FPNode(item, node)
+                node.children[item] = child
+                header[item].append(child)
+            child.count += count
+            node = child
+    return header, item_counts
+
+def _mine_fp_tree(header, item_counts, min_count: int, suffix: tuple, out: dict, max_len: int):
+    # least frequent first, as in the original FP-growth formulation
+    for item in sorted(item_counts, key=lambda i: (item_counts[i], i)):
+        itemset = suffix + (item,)
+        out[tuple(sorted(itemset))] = item_counts[item]
+        if max_len is not None and len(itemset) >= max_len:
+            continue
+        # conditional pattern base: prefix paths of every node holding `item`
+        pattern_base = []
+        for node in header[item]:
+            path = []
+            parent = node.parent
+            while parent.item is not None:
+                path.append(parent.item)
+                parent = parent.parent
+            if path:
+                pattern_base.append((path, node.count))
+        if not pattern_base:
+            continue
+        cond_header, cond_counts = _build_fp_tree(pattern_base, min_count)
+        if cond_counts:
+            _mine_fp_tree(cond_header, cond_counts, min_count, itemset, out, max_len)
+
+def fp_growth(matrix, min_support: float = 0.001, max_len: int = None) -> dict:
+    """
+    Frequent itemsets of a basket × item matrix. Returns {itemset (tuple of
+    column indices): basket count}. Items below min_support are pruned before
+    the tree is built and identical baskets are collapsed into one weighted path.
+    """
+    from scipy.sparse import csr_matrix
+    matrix = csr_matrix(matrix)
+    n_baskets = matrix.shape[0]
+    min_count = max(1, int(np.ceil(min_support * n_baskets)))
+    item_support = np.asarray((matrix > 0).sum(axis=0)).ravel()
+    frequent = np.flatnonzero(item_support >= min_count)
+    pruned = matrix[:, frequent].tocsr()
+    indptr, indices = pruned.indptr, pruned.indices
+    baskets = Counter(
+        tuple(frequent[indices[indptr[r]:indptr[r + 1]]])
+        for r in range(pruned.shape[0]) if indptr[r + 1] > indptr[r]
+    )
+    header, item_counts = _build_fp_tree(baskets.items(), min_count)
+    itemsets = {}
+    _mine_fp_tree(header, item_counts, min_count, (), itemsets, max_len)
+    return itemsets
+
+def association_rules(itemsets: dict, n_baskets: int, item_ids: list, min_confidence: float = 0.0,
+                      min_lift: float = 0.0) -> pd.DataFrame:
+    """
+    Every antecedent -> consequent split of each frequent itemset with two or
+    more items, scored by support, confidence and lift.
+    """
+    rows = []
+    for itemset, count in itemsets.items():
+        if len(itemset) < 2:
+            continue
+        support = count / n_baskets
+        for size in range(1, len(itemset)):
+            for antecedent in combinations(itemset, size):
+                consequent = tuple(i for i in itemset if i not in antecedent)
+                confidence = count / itemsets[antecedent]
+                lift = confidence / (itemsets[consequent] / n_baskets)
+                if confidence >= min_confidence and lift >= min_lift:
+                    rows.append((tuple(item_ids[i] for i in antecedent), tuple(item_ids[i] for i in consequent),
+                                 support, confidence, lift, count))
+    rules = pd.DataFrame(rows, columns=RULE_COLUMNS)
+    return rules.sort_values(["lift", "confidence"], ascending=False, ignore_index=True)
+
+def mine_rules(df: pd.DataFrame, min_support: float = 0.001, min_confidence: float = 0.1, min_lift: float = 1.0,
+               max_len: int = None, basket_col: str = "transaction_id", item_col: str = "product_id",
+               group_col: str = None) -> pd.DataFrame:
+    """
+    Association rules from transaction lines, optionally mined separately per
+    group (e.g. group_col="store_location") with support relative to the group.
+    """
+    groups = [(None, df)] if group_col is None else df.groupby(group_col, sort=True)
+    frames = []
+    for key, part in groups:
+        matrix, item_ids = build_basket_matrix(part, basket_col=basket_col, item_col=item_col)
+        itemsets = fp_growth(matrix, min_support=min_support, max_len=max_len)
+        rules = association_rules(itemsets, matrix.shape[0], item_ids,
+                                  min_confidence=min_confidence, min_lift=min_lift)
+        if group_col is not None:
+            rules.insert(0, group_col, key)
+        frames.append(rules)
+    cols = ([group_col] if group_col else []) + RULE_COLUMNS
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=cols)
+
+def rules_to_recommendations(rules: pd.DataFrame, top_k: int = 5) -> pd.DataFrame:
+    """
+    Single-item rules as product_id -> recommended_product_id pairs scored by
+    lift, the same layout recommend_topk() produces.
+    """
+    pairs = rules[(rules["antecedent"].str.len() == 1) & (rules["consequent"].str.len() == 1)]
+    recs = pd.DataFrame({
+        "product_id": pairs["antecedent"].str[0].to_numpy(),
+        "recommended_product_id": pairs["consequent"].str[0].to_numpy(),
+        "score": pairs["lift"].to_numpy(dtype=float),
+    })
+    recs = recs.sort_values(["product_id", "score"], ascending=[True, False])
+    return recs.groupby("product_id", sort=False).head(top_k).reset_index(drop=True)
+
+def recommend_for_basket(rules: pd.DataFrame, basket, top_k: int = 5) -> pd.DataFrame:
+    """
+    Items suggested for a basket by rules whose antecedent it fully contains,
+    best confidence first.
+    """
+    basket = set(basket)
+    fires = rules["antecedent"].map(basket.issuperset).astype(bool)
+    hits = rules.loc[fires].explode("consequent")
+    hits = hits[~hits["consequent"].isin(basket)]
+    best = hits.sort_values(["confidence", "lift"], ascending=False).drop_duplicates("consequent")
+    return best.head(top_k).rename(columns={"consequent": "recommended_product_id"})[
+        ["recommended_product_id", "confidence", "lift", "support"]].reset_index(drop=True)
+
+def export_rules(rules: pd.DataFrame, path: str = RULES_FILE):
+    out = rules.copy()
+    for col in ("antecedent", "consequent"):
+        out[col] = out[col].map(lambda items: "|".join(str(i) for i in items))
+    ensure_dir(os.path.dirname(path))
+    save_csv(out, path)
+
+def main():
+    raw = pd.read_csv(PATHS["phase1_clean"])
+    rules = mine_rules(raw)
+    export_rules(rules)
+    save_csv(rules_to_recommendations(rules), BASKET_RECS_FILE)
+    print(f"Association rules saved -> {RULES_FILE}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+import os
+import itertools
+import numpy as np
+import pandas as pd
+
+from config import PATHS_OPT as PATHS
+from utils import ensure_dir, save_csv
+
+MODEL_DIR = PATHS["models"]
+BATCH_FORECAST_FILE = os.path.join(MODEL_DIR, "batch_forecast.csv")
+
+# same 80% band Prophet uses by default (interval_width=0.8)
+INTERVAL_Z = 1.2816
+
+HW_GRID = {
+    "alpha": [0.1, 0.3, 0.5],
+    "beta": [0.0, 0.05],
+    "gamma": [0.1, 0.3],
+}
+
+def prepare_series_matrix(df: pd.DataFrame, group_col: str = None, date_col: str = "transaction_date",
+                          target_col: str = "revenue"):
+    """
+    Aggregate transactions into aligned daily series, one row per group.
+    Returns (Y, keys, dates) with Y of shape (n_series, n_days); days with no
+    sales are zero. group_col=None gives a single total series.
+    """
+    days = pd.to_datetime(df[date_col]).to_numpy().astype("datetime64[D]")
+    first_day = days.min()
+    day_codes = (days - first_day).astype(np.int64)
+    n_days = int(day_codes.max()) + 1
+    if group_col is None:
+        codes, keys = np.zeros(len(df), dtype=np.int64), ["total"]
+    else:
+        codes, keys = pd.factorize(df[group_col], sort=True)
+        keys = list(keys)
+    keep = codes >= 0
+    flat = codes[keep] * n_days + day_codes[keep]
+    values = df[target_col].to_numpy(dtype=np.float64)[keep]
+    Y = np.bincount(flat, weights=values, minlength=len(keys) * n_days).reshape(len(keys), n_days)
+    dates = pd.date_range(first_day, periods=n_days, freq="D")
+    return Y, keys, dates
+
+def series_from_ts(ts: pd.DataFrame):
+    """
+    Turn a prepare_forecast_df() frame (ds, y) into a 1-row matrix on a
+    contiguous daily index.
+    """
+    s = ts.set_index(pd.to_datetime(ts["ds"]))["y"].asfreq("D", fill_value=0)
+    return s.to_numpy(dtype=np.float64)[None, :], ["total"], s.index
+
+def _residual_sigma(Y: np.ndarray, fitted: np.ndarray) -> np.ndarray:
+    resid = Y - fitted
+    sigma = np.sqrt(np.nanmean(resid ** 2, axis=1))
+    return np.nan_to_num(sigma)
+
+# === Seasonal naive ===
+def fit_seasonal_naive(Y: np.ndarray, season: int = 7) -> dict:
+    fitted = np.full_like(Y, np.nan)
+    fitted[:, season:] = Y[:, :-season]
+    return {
+        "method": "seasonal_naive",
+        "season": season,
+        "last_season": Y[:, -season:].copy(),
+        "fitted": fitted,
+        "sigma": _residual_sigma(Y, fitted),
+    }
+
+def _predict_seasonal_naive(model: dict, periods: int) -> tuple:
+    season = model["season"]
+    steps = np.arange(periods)
+    yhat = model["last_season"][:, steps % season]
+    # uncertainty grows with the number of seasons we reach ahead
+    scale = np.sqrt(steps // season + 1)
+    return yhat, scale
+
+# === Holt-Winters (additive trend + additive weekly seasonality) ===
+def _holt_winters_pass(Y: np.ndarray, alpha: float, beta: float, gamma: float, season: int):
+    n, T = Y.shape
+    level = Y[:, :season].mean(axis=1)
+    if T >= 2 * season:
+        trend = (Y[:, season:2 * season].mean(axis=1) - level) / season
+    else:
+        trend = np.zeros(n)
+    seasonal = Y[:, :season] - level[:, None]
+    fitted = np.empty_like(Y)
+    for t in range(T):
+        k = t % season
+        s = seasonal[:, k]
+        fitted[:, t] = level + trend + s
+        y = Y[:, t]
+        new_level = alpha * (y - s) + (1 - alpha) * (level + trend)
+        trend = beta * (new_level - level) + (1 - beta) * trend
+        seasonal[:, k] = gamma * (y - new_level) + (1 - gamma) * s
+        level = new_level
+    return fitted, level, trend, seasonal
+
+def fit_holt_winters(Y: np.ndarray, season: int = 7, param_grid: dict = None) -> dict:
+    """
+    Additive Holt-Winters for every series at once. Smoothing parameters are
+    picked per series from param_grid by in-sample one-step SSE.
+    """
+    grid = param_grid or HW_GRID
+    keys, values = zip(*grid.items())
+    n, T = Y.shape
+    best_sse = np.full(n, np.inf)
+    best = {
+        "fitted": np.empty_like(Y),
+        "level": np.empty(n),
+        "trend": np.empty(n),
+        "seasonal": np.empty((n, season)),
+        "params": np.empty((n, len(keys))),
+    }
+    for combo in itertools.product(*values):
+        params = dict(zip(keys, combo))
+        fitted, level, trend, seasonal = _holt_winters_pass(Y, season=season, **params)
+        # skip the first season, it only reflects the initialisation
+        sse = ((Y[:, season:] - fitted[:, season:]) ** 2).sum(axis=1)
+        better = sse < best_sse
+        best_sse[better] = sse[better]
+        best["fitted"][better] = fitted[better]
+        best["level"][better] = level[better]
+        best["trend"][better] = trend[better]
+        best["seasonal"][better] = seasonal[better]
+        best["params"][better] = combo
+    fitted = best.pop("fitted")
+    fitted[:, :season] = np.nan
+    return {
+        "method": "holt_winters",
+        "season": season,
+        "n_obs": T,
+        "param_names": list(keys),
+        "fitted": fitted,
+        "sigma": _residual_sigma(Y, fitted),
+        **best,
+    }
+
+def _predict_holt_winters(model: dict, periods: int) -> tuple:
+    season, T = model["season"], model["n_obs"]
+    h = np.arange(1, periods + 1)
+    seasonal = model["seasonal"][:, (T + h - 1) % season]
+    yhat = model["level"][:, None] + h[None, :] * model["trend"][:, None] + seasonal
+    return yhat, np.sqrt(h)
+
+# === Ridge on lag + calendar features ===
+def _ridge_design(Z: np.ndarray, dow: np.ndarray, lags: tuple) -> np.ndarray:
+    """
+    Design tensor (n_series, T - max_lag, 1 + len(lags) + 6) for targets
+    Z[:, max_lag:]. Calendar terms are day-of-week dummies (Monday dropped).
+    """
+    n, T = Z.shape
+    max_lag = max(lags)
+    rows = T - max_lag
+    X = np.empty((n, rows, 1 + len(lags) + 6))
+    X[:, :, 0] = 1.0
+    for j, lag in enumerate(lags):
+        X[:, :, 1 + j] = Z[:, max_lag - lag:T - lag]
+    dummies = (dow[max_lag:, None] == np.arange(1, 7)[None, :]).astype(np.float64)
+    X[:, :, 1 + len(lags):] = dummies[None, :, :]
+    return X
+
+def fit_ridge(Y: np.ndarray, dates: pd.DatetimeIndex, lags: tuple = (1, 7, 14), alpha: float = 1.0) -> dict:
+    """
+    One ridge regression per series, solved as a single batched linear system.
+    Series are scaled by their mean so one penalty suits all of them.
+    """
+    n, T = Y.shape
+    max_lag = max(lags)
+    if T <= max_lag + 1:
+        raise ValueError(f"Need more than {max_lag + 1} days of history for lags {lags}")
+    scale = np.abs(Y).mean(axis=1)
+    scale[scale == 0] = 1.0
+    Z = Y / scale[:, None]
+    dow = dates.dayofweek.to_numpy()
+    X = _ridge_design(Z, dow, lags)
+    target = Z[:, max_lag:]
+    p = X.shape[2]
+    penalty = alpha * np.eye(p)
+    penalty[0, 0] = 0.0  # leave the intercept unpenalised
+    XtX = np.einsum("ntp,ntq->npq", X, X) + penalty[None, :, :]
+    Xty = np.einsum("ntp,nt->np", X, target)
+    coef = np.linalg.solve(XtX, Xty[:, :, None])[:, :, 0]
+    fitted = np.full_like(Y, np.nan)
+    fitted[:, max_lag:] = np.einsum("ntp,np->nt", X, coef) * scale[:, None]
+    return {
+        "method": "ridge",
+        "lags": tuple(lags),
+        "coef": coef,
+        "scale": scale,
+        "history": Z[:, -max_lag:].copy(),
+        "next_dow": int((dow[-1] + 1) % 7),
+        "fitted": fitted,
+        "sigma": _residual_sigma(Y, fitted),
+    }
+
+def _predict_ridge(model: dict, periods: int) -> tuple:
+    lags, coef = model["lags"], model["coef"]
+    max_lag = max(lags)
+    n = coef.shape[0]
+    buf = np.concatenate([model["history"], np.empty((n, periods))], axis=1)
+    for h in range(periods):
+        t = max_lag + h
+        x = np.zeros((n, coef.shape[1]))
+        x[:, 0] = 1.0
+        for j, lag in enumerate(lags):
+            x[:, 1 + j] = buf[:, t - lag]
+        d = (model["next_dow"] + h) % 7
+        if d > 0:
+            x[:, len(lags) + d] = 1.0
+        buf[:, t] = (x * coef).sum(axis=1)
+    yhat = buf[:, max_lag:] * model["scale"][:, None]
+    return yhat, np.sqrt(np.arange(1, periods + 1))
+
+# === Dispatch ===
+BATCH_METHODS = ("seasonal_naive", "holt_winters", "ridge")
+
+def fit_batch(Y: np.ndarray, dates: pd.DatetimeIndex, method: str = "holt_winters", season: int = 7, **kwargs) -> dict:
+    if method == "seasonal_naive":
+        model = fit_seasonal_naive(Y, season=season)
+    elif method == "holt_winters":
+        model = fit_holt_winters(Y, season=season, **kwargs)
+    elif method == "ridge":
+        model = fit_ridge(Y, dates, **kwargs)
+    else:
+        raise ValueError(f"Unknown batch forecasting method '{method}', expected one of {BATCH_METHODS}")
+    model["dates"] = dates
+    return model
+
+def predict_batch(model: dict, periods: int = 30) -> tuple:
+    """
+    Future point forecasts and 80% bounds, each of shape (n_series, periods).
+    Only uses the fitted state, so any horizon can be asked for without refitting.
+    """
+    method = model["method"]
+    if method == "seasonal_naive":
+        yhat, scale = _predict_seasonal_naive(model, periods)
+    elif method == "holt_winters":
+        yhat, scale = _predict_holt_winters(model, periods)
+    elif method == "ridge":
+        yhat, scale = _predict_ridge(model, periods)
+    else:
+        raise ValueError(f"Unknown batch forecasting method '{method}', expected one of {BATCH_METHODS}")
+    band = INTERVAL_Z * model["sigma"][:, None] * scale[None, :]
+    return yhat, yhat - band, yhat + band
+
+def batch_forecast_frame(model: dict, keys: list, periods: int = 30, key_col: str = "series") -> pd.DataFrame:
+    """
+    History fit plus future forecast for every series, in the same
+    ds/yhat/yhat_lower/yhat_upper layout as forecast(). Warm-up days without
+    a fitted value are left out.
+    """
+    dates = model["dates"]
+    yhat, lower, upper = predict_batch(model, periods)
+    fitted = model["fitted"]
+    band = INTERVAL_Z * model["sigma"][:, None]
+    all_dates = dates.append(pd.date_range(dates[-1] + pd.Timedelta(days=1), periods=periods, freq="D"))
+    full = np.concatenate([fitted, yhat], axis=1)
+    full_lower = np.concatenate([fitted - band, lower], axis=1)
+    full_upper = np.concatenate([fitted + band, upper], axis=1)
+    n, T = full.shape
+    s, d = np.meshgrid(np.arange(n), np.arange(T), indexing="ij")
+    out = pd.DataFrame({
+        key_col: np.asarray(keys, dtype=object)[s.ravel()],
+        "ds": all_dates[d.ravel()],
+        "yhat": full.ravel(),
+        "yhat_lower": full_lower.ravel(),
+        "yhat_upper": full_upper.ravel(),
+    })
+    return out.dropna(subset=["yhat"]).reset_index(drop=True)
+
+def forecast_batch(df: pd.DataFrame, group_col: str = None, method: str = "holt_winters", periods: int = 30,
+                   target_col: str = "revenue", **kwargs) -> pd.DataFrame:
+    Y, keys, dates = prepare_series_matrix(df, group_col=group_col, target_col=target_col)
+    model = fit_batch(Y, dates, method=method, **kwargs)
+    return batch_forecast_frame(model, keys, periods=periods, key_col=group_col or "series")
+
+def export_batch_forecast(df: pd.DataFrame, path: str = BATCH_FORECAST_FILE):
+    ensure_dir(os.path.dirname(path))
+    save_csv(df, path)
+
+def main():
+    raw = pd.read_csv(PATHS["phase1_clean"], parse_dates=["transaction_date"])
+    per_product = forecast_batch(raw, group_col="product_id", method="holt_winters", periods=30)
+    export_batch_forecast(per_product)
+    print(f"Batch forecast saved -> {BATCH_FORECAST_FILE}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+import os
+import warnings
+import numpy as np
+import pandas as pd
+
+from config import PATHS_OPT as PATHS
+from utils import ensure_dir, save_csv
+
+BOOTSTRAP_FILE = os.path.join(PATHS["metrics"], "metrics_bootstrap.csv")
+ALL_GROUPS = "ALL"
+# resamples drawn per block, so the (block, n) count matrix stays small for long inputs
+BLOCK_SIZE = 250
+
+def resample_counts(codes: np.ndarray, n_boot: int = 1000, seed: int = 42, block_size: int = BLOCK_SIZE):
+    """
+    Yield (block, n) matrices of bootstrap multiplicities. All resamples of a
+    block are drawn at once as an index matrix, within each group of `codes`
+    (stratified), then turned into per-row counts with one bincount.
+    The first row of the first block is all ones: the point estimate.
+    """
+    rng = np.random.default_rng(seed)
+    n = codes.size
+    order = np.argsort(codes, kind="stable")
+    sizes = np.bincount(codes)
+    starts = np.cumsum(sizes) - sizes
+    g = codes[order]
+    yield np.ones((1, n))
+    done = 0
+    while done < n_boot:
+        b = min(block_size, n_boot - done)
+        # sorted position j of group g draws uniformly from that group's slice
+        idx = order[starts[g] + (rng.random((b, n)) * sizes[g]).astype(np.int64)]
+        flat = (idx + np.arange(b)[:, None] * n).ravel()
+        yield np.bincount(flat, minlength=b * n).reshape(b, n).astype(np.float64)
+        done += b
+
+def _grouped_sums(W: np.ndarray, values: np.ndarray, codes: np.ndarray, n_groups: int) -> np.ndarray:
+    """(R, n) weights x per-row values -> (R, n_groups) weighted sums per group."""
+    onehot = np.zeros((values.size, n_groups))
+    onehot[np.arange(values.size), codes] = values
+    return W @ onehot
+
+def _safe_div(num, den):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(den > 0, num / den, np.nan)
+
+def weighted_auc(score: np.ndarray, y: np.ndarray, W: np.ndarray, codes: np.ndarray, n_groups: int) -> np.ndarray:
+    """
+    Rank-based (Mann-Whitney) ROC AUC for every weight row and group at once.
+    Rows are sorted by (group, score) a single time; each resample's AUC is
+    sum over tie blocks of pos_weight * (neg_weight_below + neg_weight_tied / 2),
+    normalised by total positive x negative weight. Returns (R, n_groups).
+    """
+    order = np.lexsort((score, codes))
+    s, yy, c = score[order], y[order].astype(np.float64), codes[order]
+    Wo = W[:, order]
+    starts = np.flatnonzero(np.r_[True, (s[1:] != s[:-1]) | (c[1:] != c[:-1])])
+    pos = np.add.reduceat(Wo * yy, starts, axis=1)
+    neg = np.add.reduceat(Wo * (1.0 - yy), starts, axis=1)
+    block_group = c[starts]
+    group_start = np.flatnonzero(np.r_[True, block_group[1:] != block_group[:-1]])
+    owner = np.cumsum(np.r_[True, block_group[1:] != block_group[:-1]]) - 1
+    neg_below = np.cumsum(neg, axis=1) - neg
+    neg_below -= neg_below[:, group_start][:, owner]
+    num = np.add.reduceat(pos * (neg_below + 0.5 * neg), group_start, axis=1)
+    den = np.add.reduceat(pos, group_start, axis=1) * np.add.reduceat(neg, group_start, axis=1)
+    out = np.full((W.shape[0], n_groups), np.nan)
+    out[:, block_group[group_start]] = _safe_div(num, den)
+    return out
+
+# === metric families: each maps (W, codes, n_groups) -> (R, n_groups) ===
+def _classification_metrics(y: np.ndarray, score: np.ndarray, threshold: float) -> dict:
+    pred = (score >= threshold).astype(np.float64)
+    yf = y.astype(np.float64)
+    tp, fp, fn = pred * yf, pred * (1 - yf), (1 - pred) * yf
+    correct = (pred == yf).astype(np.float64)
+
+    def f1(W, codes, G):
+        TP = _grouped_sums(W, tp, codes, G)
+        return _safe_div(2 * TP, 2 * TP + _grouped_sums(W, fp, codes, G) + _grouped_sums(W, fn, codes, G))
+
+    return {
+        "roc_auc": lambda W, codes, G: weighted_auc(score, y, W, codes, G),
+        "accuracy": lambda W, codes, G: _safe_div(_grouped_sums(W, correct, codes, G),
+                                                  _grouped_sums(W, np.ones_like(yf), codes, G)),
+        "f1": f1,
+    }
+
+def _forecast_metrics(y: np.ndarray, yhat: np.ndarray) -> dict:
+    err = yhat - y
+    nonzero = (y != 0).astype(np.float64)
+    ape = np.where(y != 0, np.abs(err) / np.where(y != 0, np.abs(y), 1.0), 0.0) * 100
+    ones = np.ones_like(err)
+    return {
+        "rmse": lambda W, codes, G: np.sqrt(_safe_div(_grouped_sums(W, err ** 2, codes, G),
+                                                      _grouped_sums(W, ones, codes, G))),
+        "mae": lambda W, codes, G: _safe_div(_grouped_sums(W, np.abs(err), codes, G),
+                                             _grouped_sums(W, ones, codes, G)),
+        # days with zero actuals are left out, as in horizon_metrics()
+        "mape": lambda W, codes, G: _safe_div(_grouped_sums(W, ape, codes, G),
+                                              _grouped_sums(W, nonzero, codes, G)),
+    }
+
+def _mean_metric(name: str, values: np.ndarray) -> dict:
+    ones = np.ones_like(values, dtype=np.float64)
+    return {name: lambda W, codes, G: _safe_div(_grouped_sums(W, values.astype(np.float64), codes, G),
+                                                _grouped_sums(W, ones, codes, G))}
+
+# === engine ===
+def bootstrap(metric_sets: dict, n: int, groups=None, n_boot: int = 1000, alpha: float = 0.05,
+              seed: int = 42, baseline: str = None) -> pd.DataFrame:
+    """
+    Evaluate {model: {metric: fn}} on the same stratified resamples.
+    Returns one row per model × group × metric with the point estimate,
+    percentile CI and bootstrap std; groups (e.g. store_location) get their
+    own rows plus an "ALL" row. With `baseline`, paired delta_<metric> rows
+    (model - baseline on identical resamples) say whether a change is real.
+    """
+    if groups is None:
+        codes, labels = np.zeros(n, dtype=np.int64), np.array([ALL_GROUPS], dtype=object)
+    else:
+        codes, labels = pd.factorize(pd.Series(groups).to_numpy(), sort=True)
+        labels = np.append(np.asarray(labels, dtype=object), ALL_GROUPS)
+    n_groups = len(labels)
+    overall = np.zeros(n, dtype=np.int64)
+
+    draws = {(m, k): [] for m, fns in metric_sets.items() for k in fns}
+    for W in resample_counts(codes, n_boot=n_boot, seed=seed):
+        for model, fns in metric_sets.items():
+            for metric, fn in fns.items():
+                per_group = fn(W, codes, n_groups - 1) if groups is not None else np.empty((W.shape[0], 0))
+                draws[(model, metric)].append(np.hstack([per_group, fn(W, overall, 1)]))
+    draws = {key: np.vstack(parts) for key, parts in draws.items()}  # (n_boot + 1, n_groups)
+    if baseline is not None:
+        for (model, metric), values in list(draws.items()):
+            if model != baseline and (baseline, metric) in draws:
+                draws[(model, f"delta_{metric}")] = values - draws[(baseline, metric)]
+
+    lo_q, hi_q = 100 * alpha / 2, 100 * (1 - alpha / 2)
+    frames = []
+    for (model, metric), values in draws.items():
+        point, boots = values[0], values[1:]
+        with warnings.catch_warnings():
+            # all-NaN columns (e.g. a store with one class) just yield NaN bounds
+            warnings.simplefilter("ignore", RuntimeWarning)
+            lower, upper = np.nanpercentile(boots, [lo_q, hi_q], axis=0)
+            std = np.nanstd(boots, axis=0)
+        frames.append(pd.DataFrame({
+            "model": model, "group": labels, "metric": metric,
+            "estimate": point, "lower": lower, "upper": upper, "std": std,
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+def bootstrap_classification(y_true, scores: dict, groups=None, threshold: float = 0.5, **kw) -> pd.DataFrame:
+    """
+    ROC AUC (on probabilities), accuracy and F1 with CIs for several models.
+    scores maps model name -> predicted churn probability per row of y_true.
+    """
+    y = np.asarray(y_true).astype(np.int64)
+    metric_sets = {m: _classification_metrics(y, np.asarray(s, dtype=np.float64), threshold)
+                   for m, s in scores.items()}
+    return bootstrap(metric_sets, y.size, groups=groups, **kw)
+
+def bootstrap_forecast(y_true, preds: dict, groups=None, **kw) -> pd.DataFrame:
+    """RMSE / MAE / MAPE with CIs; preds maps model name -> yhat aligned with y_true."""
+    y = np.asarray(y_true, dtype=np.float64)
+    metric_sets = {m: _forecast_metrics(y, np.asarray(p, dtype=np.float64)) for m, p in preds.items()}
+    return bootstrap(metric_sets, y.size, groups=groups, **kw)
+
+def bootstrap_precision_at_k(recs_df: pd.DataFrame, ground_truth_df: pd.DataFrame, k: int = 5,
+                             model: str = "recommender", **kw) -> pd.DataFrame:
+    """precision@k with a CI, resampling the query products of ground_truth_df."""
+    top = recs_df.groupby("product_id", sort=False).head(k)[["product_id", "recommended_product_id"]]
+    truth = ground_truth_df[["product_id", "recommended_product_id"]].drop_duplicates()
+    hits = top.merge(truth, on=["product_id", "recommended_product_id"], how="inner").groupby("product_id").size()
+    shown = top.groupby("product_id").size()
+    queries = shown.index.intersection(truth["product_id"].unique())
+    precision = (hits.reindex(queries, fill_value=0) / shown.reindex(queries)).to_numpy(dtype=np.float64)
+    return bootstrap({model: _mean_metric("precision@k", precision)}, precision.size, **kw)
+
+def export_bootstrap(df: pd.DataFrame, path: str = BOOTSTRAP_FILE):
+    ensure_dir(os.path.dirname(path))
+    save_csv(df, path)
+
+def main():
+    from phase2_optimized_backtesting import BACKTEST_FOLDS_FILE
+    frames = []
+    if os.path.exists(BACKTEST_FOLDS_FILE):
+        folds = pd.read_csv(BACKTEST_FOLDS_FILE)
+        for backend, part in folds.groupby("backend"):
+            frames.append(bootstrap_forecast(part["y"], {backend: part["yhat"]}))
+    from phase2_optimized_entities import CHURN_ENTITY_COLS
+    from phase2_optimized_evaluate import held_out, join_labels
+    from phase2_optimized_models_churn import load_churn_labels
+    key_cols = list(CHURN_ENTITY_COLS)
+    scores = None
+    for name in ("lr", "rf", "hgb"):
+        path = os.path.join(PATHS["models"], f"{name}_churn_predictions.csv")
+        if not os.path.exists(path):
+            continue
+        preds = pd.read_csv(path)
+        if "probability" not in preds.columns:
+            continue
+        # held-out rows only: in-sample scores would make the intervals look tighter than they are
+        part = held_out(preds)[key_cols + ["probability"]].rename(columns={"probability": name})
+        if scores is None:
+            scores = part
+            continue
+        merged = scores.merge(part, on=key_cols, how="inner", validate="one_to_one")
+        if len(merged) != len(scores) or len(merged) != len(part):
+            raise ValueError(f"{name} predictions cover different held-out entities; re-run the churn stage")
+        scores = merged
+    if scores is not None:
+        # labels stored at training time (same as_of / churn_days as the models)
+        labels = load_churn_labels()[key_cols + ["churn_flag"]]
+        scored = join_labels(scores, labels, key_cols)
+        models = [c for c in scored.columns if c not in key_cols + ["churn_flag"]]
+        frames.append(bootstrap_classification(scored["churn_flag"], {m: scored[m] for m in models},
+                                               groups=scored["store_location"],
+                                               baseline="lr" if "lr" in models else None))
+    if frames:
+        export_bootstrap(pd.concat(frames, ignore_index=True))
+        print(f"Bootstrap metrics saved -> {BOOTSTRAP_FILE}")
+
+if __name__ == "__main__":
+    main()
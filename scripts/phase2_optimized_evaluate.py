@@ -1,7 +1,7 @@
 import os
+import logging
 import numpy as np
 import pandas as pd
-from sklearn.metrics import mean_squared_error, mean_absolute_error, accuracy_score, f1_score, roc_auc_score
 
 from config import PATHS_OPT as PATHS
 from utils import ensure_dir, save_csv
@@ -10,18 +10,47 @@ METRICS_FILE = os.path.join(PATHS["metrics"], "metrics.csv")
 
 def evaluate_forecast(y_true: pd.Series, y_pred: pd.Series) -> dict:
     y_true, y_pred = np.array(y_true), np.array(y_pred)
-    rmse = float(np.sqrt(mean_squared_error(y_true, y_pred)))
-    mae = float(mean_absolute_error(y_true, y_pred))
+    rmse = float(np.sqrt(np.mean((y_true - y_pred) ** 2)))
+    mae = float(np.mean(np.abs(y_true - y_pred)))
     mape = float(np.mean(np.abs((y_true - y_pred) / (y_true + 1e-9))) * 100)
     return {"forecast_rmse": rmse, "forecast_mae": mae, "forecast_mape": mape}
 
-def evaluate_classification(y_true: pd.Series, y_pred: pd.Series) -> dict:
+def evaluate_classification(y_true: pd.Series, y_pred: pd.Series, y_score: pd.Series = None) -> dict:
+    """Accuracy / F1 on the hard labels; ROC AUC on the churn probabilities y_score."""
+    from sklearn.metrics import accuracy_score, f1_score, roc_auc_score
+    if y_score is None:
+        logging.warning("[WARN] No churn probabilities given; ROC AUC computed on hard predictions.")
+        y_score = y_pred
     return {
         "churn_accuracy": float(accuracy_score(y_true, y_pred)),
         "churn_f1": float(f1_score(y_true, y_pred)),
-        "churn_roc_auc": float(roc_auc_score(y_true, y_pred))
+        "churn_roc_auc": float(roc_auc_score(y_true, y_score))
     }
 
+def join_labels(preds: pd.DataFrame, labels: pd.DataFrame, key_cols) -> pd.DataFrame:
+    """
+    Attach the true label to each exported prediction by entity key (e.g.
+    store_location, product_id). Raises ValueError if the predictions carry
+    no key columns or any key has no label, rather than pairing rows by position.
+    """
+    key_cols = list(key_cols)
+    missing_cols = [c for c in key_cols if c not in preds.columns]
+    if missing_cols:
+        raise ValueError(f"Predictions have no {missing_cols} columns; re-export them with entity keys")
+    merged = preds.merge(labels, on=key_cols, how="left", validate="one_to_one", indicator=True)
+    unmatched = merged["_merge"] != "both"
+    if unmatched.any():
+        sample = merged.loc[unmatched, key_cols].head(3).to_dict("records")
+        raise ValueError(f"{int(unmatched.sum())} predictions have no label for their {key_cols} key, e.g. {sample}")
+    return merged.drop(columns="_merge")
+
+def held_out(preds: pd.DataFrame) -> pd.DataFrame:
+    """Rows of an exported predictions file the model was not trained on."""
+    from phase2_optimized_models_churn import SPLIT_COL, HOLDOUT
+    if SPLIT_COL not in preds.columns:
+        raise ValueError(f"Predictions have no '{SPLIT_COL}' column; re-export them so held-out rows are known")
+    return preds[preds[SPLIT_COL] == HOLDOUT]
+
 def evaluate_recommendations(recs_df: pd.DataFrame, ground_truth_df: pd.DataFrame = None, k: int = 5) -> dict:
     # If no ground truth provided, return basic stats
     if ground_truth_df is None:
@@ -43,7 +72,7 @@ def export_metrics(metrics: dict):
     df = pd.DataFrame([metrics])
     save_csv(df, METRICS_FILE)
 
-if __name__ == "__main__":
+def main():
     # Example wiring: load produced outputs and compute metrics
     # Forecast metrics
     forecast_csv = os.path.join(PATHS["models"], "prophet_forecast.csv")
@@ -60,9 +89,13 @@ if __name__ == "__main__":
     # Churn metrics
     lr_preds_file = os.path.join(PATHS["models"], "lr_churn_predictions.csv")
     if os.path.exists(lr_preds_file):
-        preds = pd.read_csv(lr_preds_file)["prediction"]
-        y_true = pd.read_csv(PATHS["phase1_clean"])["churn_flag"]
-        c_metrics = evaluate_classification(y_true.iloc[:len(preds)], preds)
+        from phase2_optimized_entities import CHURN_ENTITY_COLS
+        from phase2_optimized_models_churn import load_churn_labels
+        # the labels stored at training time, not ones re-derived from today's clean_sales.csv
+        labels = load_churn_labels()[list(CHURN_ENTITY_COLS) + ["churn_flag"]]
+        lr_out = join_labels(held_out(pd.read_csv(lr_preds_file)), labels, CHURN_ENTITY_COLS)
+        scores = lr_out["probability"] if "probability" in lr_out.columns else None
+        c_metrics = evaluate_classification(lr_out["churn_flag"], lr_out["prediction"], scores)
     else:
         c_metrics = {}
 
@@ -74,6 +107,16 @@ if __name__ == "__main__":
     else:
         r_metrics = {}
 
-    metrics = {**f_metrics, **c_metrics, **r_metrics}
+    # Out-of-sample forecast metrics from the last backtest
+    from phase2_optimized_backtesting import BACKTEST_FILE, summarize_backtest
+    if os.path.exists(BACKTEST_FILE):
+        b_metrics = summarize_backtest(pd.read_csv(BACKTEST_FILE))
+    else:
+        b_metrics = {}
+
+    metrics = {**f_metrics, **b_metrics, **c_metrics, **r_metrics}
     export_metrics(metrics)
     print(f"Metrics exported -> {METRICS_FILE}")
+
+if __name__ == "__main__":
+    main()
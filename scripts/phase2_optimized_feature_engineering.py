@@ -5,58 +5,125 @@ from config import PATHS_OPT as PATHS
 from utils import ensure_dir, save_csv
 
 FEATURES_FILE = os.path.join(PATHS["features"], "features.csv")
+STORE_FEATURES_FILE = os.path.join(PATHS["features"], "store_features.csv")
 
 def compute_revenue_growth(df: pd.DataFrame, group_col: str = "store_location", freq: int = 7) -> pd.DataFrame:
-    df = df.copy()
+    """
+    Adds revenue_growth (vs. the previous line of the same group in date
+    order) and rev_{freq}d_mean in place. Rows keep their order: the group /
+    date order is only used as an index, so the frame is never re-sorted.
+    """
     df["transaction_date"] = pd.to_datetime(df["transaction_date"])
-    df = df.sort_values(["transaction_date"])
-    df["rev_lag"] = df.groupby(group_col)["revenue"].shift(1)
-    df["revenue_growth"] = (df["revenue"] - df["rev_lag"]) / df["rev_lag"].replace(0, np.nan)
-    df["revenue_growth"] = df["revenue_growth"].fillna(0)
+    codes, _ = pd.factorize(df[group_col], sort=True)
+    days = df["transaction_date"].to_numpy().astype("datetime64[D]").astype(np.int64)
+    order = np.lexsort((days, codes))  # stable: same-day lines keep their input order
+    rev = df["revenue"].to_numpy(dtype=np.float64)[order]
+    c = codes[order]
+    first = np.r_[True, c[1:] != c[:-1]]
+
+    lag = np.r_[np.nan, rev[:-1]]
+    lag[first | (lag == 0)] = np.nan
+    growth = np.nan_to_num((rev - lag) / lag, nan=0.0)
+
+    # rolling mean over the last `freq` lines of the group via one cumulative sum
+    pos = np.arange(rev.size)
+    start = np.maximum.accumulate(np.where(first, pos, 0))
+    lo = np.maximum(pos - freq + 1, start)
+    csum = np.r_[0.0, np.cumsum(rev)]
+    rolling = (csum[pos + 1] - csum[lo]) / (pos + 1 - lo)
+
+    out_growth = np.empty(rev.size, dtype=np.float32)
+    out_rolling = np.empty(rev.size, dtype=np.float32)
+    out_growth[order] = growth
+    out_rolling[order] = rolling
+    df["revenue_growth"] = out_growth
+    df[f"rev_{freq}d_mean"] = out_rolling
     return df
 
+def store_category_mix(df: pd.DataFrame):
+    """
+    Share of each store's revenue per product category as a small float32
+    array of shape (n_stores, n_categories), plus the store and category labels.
+    """
+    store_codes, stores = pd.factorize(df["store_location"], sort=True)
+    cat_codes, cats = pd.factorize(df["product_category"], sort=True)
+    keep = (store_codes >= 0) & (cat_codes >= 0)
+    rev = df["revenue"].to_numpy(dtype=np.float64)[keep]
+    flat = store_codes[keep] * len(cats) + cat_codes[keep]
+    sums = np.bincount(flat, weights=rev, minlength=len(stores) * len(cats)).reshape(len(stores), len(cats))
+    total = sums.sum(axis=1, keepdims=True)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mix = np.where(total != 0, sums / total, 0.0).astype(np.float32)
+    return mix, stores, cats
+
 def compute_category_mix(df: pd.DataFrame) -> pd.DataFrame:
-    cat = df.groupby([ "store_location", "product_category"])["revenue"].sum().reset_index()
-    total = df.groupby("store_location")["revenue"].sum().reset_index(name="total_revenue")
-    merged = cat.merge(total, on="store_location", how="left")
-    merged["category_mix_pct"] = merged["revenue"] / merged["total_revenue"].replace(0, np.nan)
-    merged["category_mix_pct"] = merged["category_mix_pct"].fillna(0)
-    # pivot so each category becomes a column per store
-    pivot = merged.pivot_table(index="store_location", columns="product_category", values="category_mix_pct", fill_value=0)
-    pivot = pivot.reset_index()
-    pivot.columns.name = None
+    """Store-level table: one row per store_location, one column per product category."""
+    mix, stores, cats = store_category_mix(df)
+    pivot = pd.DataFrame(mix, columns=list(cats))
+    pivot.insert(0, "store_location", list(stores))
     return pivot
 
+def attach_store_features(feat: pd.DataFrame, table: np.ndarray, columns, code_col: str = "store_code") -> pd.DataFrame:
+    """
+    Broadcast a (n_stores, k) store-level table onto rows by integer store
+    code with one take; rows without a store (code -1) get NaN.
+    """
+    padded = np.vstack([table, np.full((1, table.shape[1]), np.nan, dtype=table.dtype)])
+    block = np.take(padded, feat[code_col].to_numpy(), axis=0)
+    return pd.concat([feat, pd.DataFrame(block, columns=list(columns), index=feat.index)], axis=1)
+
 def add_time_features(df: pd.DataFrame) -> pd.DataFrame:
-    df = df.copy()
+    """Adds dow / month / day / is_weekend in place."""
     df["transaction_date"] = pd.to_datetime(df["transaction_date"])
-    df["dow"] = df["transaction_date"].dt.dayofweek
-    df["month"] = df["transaction_date"].dt.month
-    df["day"] = df["transaction_date"].dt.day
-    df["is_weekend"] = df["dow"].isin([5,6]).astype(int)
+    dates = df["transaction_date"].dt
+    df["dow"] = dates.dayofweek.astype(np.int8)
+    df["month"] = dates.month.astype(np.int8)
+    df["day"] = dates.day.astype(np.int8)
+    df["is_weekend"] = (df["dow"] >= 5).astype(np.int8)
     return df
 
-def build_feature_matrix(df: pd.DataFrame) -> pd.DataFrame:
-    # transaction-level time features + growth
-    df_tf = add_time_features(df)
-    df_growth = compute_revenue_growth(df_tf)
-    # store-level category mix pivot
-    cat_mix = compute_category_mix(df)
-    # merge: left join transaction rows with store-level category mix
-    feat = df_growth.merge(cat_mix, how="left", on="store_location")
-    # example rolling metric per store
-    feat["rev_7d_mean"] = feat.groupby("store_location")["revenue"].transform(lambda x: x.rolling(7, min_periods=1).mean())
-    # drop helpers
-    feat = feat.drop(columns=["rev_lag"], errors="ignore")
+def build_feature_matrix(df: pd.DataFrame, broadcast_store_features: bool = True) -> pd.DataFrame:
+    """
+    Transaction-level time and growth features plus the store-level category
+    mix. The mix stays a small (n_stores, n_categories) table joined by
+    integer store_code; with broadcast_store_features=False it is not
+    attached at all (see build_store_features / attach_store_features) and
+    the broadcast is left to model-input time.
+    """
+    # shallow: the caller's frame keeps its columns, no data is copied
+    feat = df.copy(deep=False)
+    add_time_features(feat)
+    compute_revenue_growth(feat)
+    codes, _ = pd.factorize(feat["store_location"], sort=True)
+    feat["store_code"] = codes.astype(np.int32)
+    if broadcast_store_features:
+        mix, _, cats = store_category_mix(df)
+        feat = attach_store_features(feat, mix, cats)
     return feat
 
+def build_store_features(df: pd.DataFrame) -> pd.DataFrame:
+    """Store-level feature table indexed by store_code, for deferred attachment."""
+    mix, stores, cats = store_category_mix(df)
+    table = pd.DataFrame(mix, columns=list(cats))
+    table.insert(0, "store_location", list(stores))
+    table.index.name = "store_code"
+    return table
+
 def export_features(df: pd.DataFrame, path: str = FEATURES_FILE):
     ensure_dir(os.path.dirname(path))
     save_csv(df, path)
 
-if __name__ == "__main__":
+def export_store_features(table: pd.DataFrame, path: str = STORE_FEATURES_FILE):
+    ensure_dir(os.path.dirname(path))
+    save_csv(table.reset_index(), path)
+
+def main():
     raw_path = PATHS["phase1_clean"]
     raw = pd.read_csv(raw_path, parse_dates=["transaction_date"])
-    feats = build_feature_matrix(raw)
+    feats = build_feature_matrix(raw, broadcast_store_features=False)
     export_features(feats)
-    print.info(f"Features exported -> {FEATURES_FILE}")
+    export_store_features(build_store_features(raw))
+    print(f"Features exported -> {FEATURES_FILE}, {STORE_FEATURES_FILE}")
+
+if __name__ == "__main__":
+    main()
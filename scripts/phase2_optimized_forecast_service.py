@@ -0,0 +1,194 @@
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+import pandas as pd
+
+from config import PATHS_OPT as PATHS
+
+DEFAULT_TTL = 300.0
+MAX_ENTRIES = 256
+TOTAL_SERIES = "total"
+
+def file_data_version(path: str = PATHS["phase1_clean"]) -> str:
+    """Cheap data version for a file: size + mtime, one stat() call per query."""
+    st = os.stat(path)
+    return f"{st.st_size}-{st.st_mtime_ns}"
+
+def frame_data_version(df: pd.DataFrame) -> str:
+    """Content hash of a DataFrame, for in-memory sources without a file."""
+    return format(int(pd.util.hash_pandas_object(df, index=False).sum()) & (2 ** 64 - 1), "016x")
+
+def _load_phase1() -> pd.DataFrame:
+    return pd.read_csv(PATHS["phase1_clean"], parse_dates=["transaction_date"])
+
+class ForecastService:
+    """
+    Serves future forecasts per (series, horizon) without refitting on every
+    request. Three layers, all tied to the current data version:
+
+    - the daily series matrix, built once per version;
+    - fitted models: one batch model for every series (NumPy backends) or
+      one Prophet model per series, fitted on first use;
+    - an LRU of prediction frames keyed by (series, horizon, data version)
+      with a TTL. A miss is answered from the fitted model (or by slicing a
+      longer cached horizon), never by a refit.
+
+    Each query stats the data source; when version_fn() returns a new value
+    every layer is dropped and the next query refits from the new data.
+    """
+
+    def __init__(self, backend: str = "holt_winters", group_col: str = None, ttl: float = DEFAULT_TTL,
+                 max_entries: int = MAX_ENTRIES, loader=_load_phase1, version_fn=file_data_version,
+                 target_col: str = "revenue"):
+        from phase2_optimized_forecasting import FORECAST_BACKENDS
+        if backend not in FORECAST_BACKENDS:
+            raise ValueError(f"Unknown forecast backend '{backend}', expected one of {FORECAST_BACKENDS}")
+        self.backend = backend
+        self.group_col = group_col
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.loader = loader
+        self.version_fn = version_fn
+        self.target_col = target_col
+        self.stats = {"hits": 0, "misses": 0, "fits": 0, "invalidations": 0}
+        self._lock = threading.RLock()
+        self._version = None
+        self._series = None   # (Y, keys, dates, key -> row)
+        self._models = {}     # series key (or None for the batch model) -> fitted model
+        self._cache = OrderedDict()  # (series, horizon, version) -> (expires_at, frame)
+
+    # === versioning ===
+    def invalidate(self):
+        with self._lock:
+            self._series = None
+            self._models.clear()
+            self._cache.clear()
+            self.stats["invalidations"] += 1
+
+    def _check_version(self) -> str:
+        version = self.version_fn()
+        if version != self._version:
+            if self._version is not None:
+                logging.info(f"[OK] Data version {self._version} -> {version}; forecast cache invalidated.")
+                self.invalidate()
+            self._version = version
+        return version
+
+    # === models ===
+    def _series_matrix(self):
+        if self._series is None:
+            from phase2_optimized_batch_forecasting import prepare_series_matrix
+            Y, keys, dates = prepare_series_matrix(self.loader(), group_col=self.group_col, target_col=self.target_col)
+            self._series = (Y, keys, dates, {k: i for i, k in enumerate(keys)})
+        return self._series
+
+    def series_keys(self) -> list:
+        with self._lock:
+            self._check_version()
+            return list(self._series_matrix()[1])
+
+    def _row(self, series) -> int:
+        rows = self._series_matrix()[3]
+        if series not in rows:
+            raise KeyError(f"Unknown series {series!r}")
+        return rows[series]
+
+    def _model(self, row: int):
+        Y, _, dates, _ = self._series_matrix()
+        if self.backend == "prophet":
+            if row not in self._models:
+                from phase2_optimized_forecasting import train_prophet
+                self._models[row] = train_prophet(pd.DataFrame({"ds": dates, "y": Y[row]}))
+                self.stats["fits"] += 1
+            return self._models[row]
+        if None not in self._models:
+            # one vectorized fit covers every series of the group
+            from phase2_optimized_batch_forecasting import fit_batch
+            self._models[None] = fit_batch(Y, dates, method=self.backend)
+            self.stats["fits"] += 1
+        return self._models[None]
+
+    def _predict(self, row: int, horizon: int) -> pd.DataFrame:
+        model = self._model(row)
+        if self.backend == "prophet":
+            future = model.make_future_dataframe(periods=horizon, include_history=False)
+            return model.predict(future)[["ds", "yhat", "yhat_lower", "yhat_upper"]]
+        from phase2_optimized_batch_forecasting import predict_batch
+        dates = model["dates"]
+        yhat, lower, upper = predict_batch(model, horizon)
+        return pd.DataFrame({
+            "ds": pd.date_range(dates[-1] + pd.Timedelta(days=1), periods=horizon, freq="D"),
+            "yhat": yhat[row],
+            "yhat_lower": lower[row],
+            "yhat_upper": upper[row],
+        })
+
+    # === cache ===
+    def _lookup(self, series, horizon: int, version: str, now: float):
+        entry = self._cache.get((series, horizon, version))
+        if entry is not None and entry[0] > now:
+            self._cache.move_to_end((series, horizon, version))
+            return entry[1]
+        # a longer live horizon for the same series already holds the answer
+        for (s, h, v), (expires, frame) in self._cache.items():
+            if s == series and v == version and h > horizon and expires > now:
+                return frame.iloc[:horizon]
+        return None
+
+    def _store(self, key: tuple, frame: pd.DataFrame, now: float):
+        self._cache[key] = (now + self.ttl, frame)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+
+    def get_forecast(self, series=None, horizon: int = 30) -> pd.DataFrame:
+        """
+        Future ds/yhat/yhat_lower/yhat_upper rows for one series (a group_col
+        value, or the total series when group_col is None). The returned frame
+        is shared with the cache; copy it before modifying.
+        """
+        if series is None and self.group_col is None:
+            series = TOTAL_SERIES
+        with self._lock:
+            version = self._check_version()
+            now = time.monotonic()
+            frame = self._lookup(series, horizon, version, now)
+            if frame is not None:
+                self.stats["hits"] += 1
+                return frame
+            self.stats["misses"] += 1
+            frame = self._predict(self._row(series), horizon)
+            self._store((series, horizon, version), frame, now)
+            return frame
+
+    def get_forecasts(self, series_list=None, horizon: int = 30) -> pd.DataFrame:
+        """Forecasts for several series (default: all) in one long frame."""
+        keys = self.series_keys() if series_list is None else list(series_list)
+        key_col = self.group_col or "series"
+        frames = [self.get_forecast(s, horizon).assign(**{key_col: s}) for s in keys]
+        return pd.concat(frames, ignore_index=True)[[key_col, "ds", "yhat", "yhat_lower", "yhat_upper"]]
+
+_DEFAULT_SERVICES = {}
+
+def get_forecast_service(backend: str = "holt_winters", group_col: str = None, **kwargs) -> ForecastService:
+    """Process-wide service per (backend, group_col), so every caller shares one cache."""
+    key = (backend, group_col)
+    if key not in _DEFAULT_SERVICES:
+        _DEFAULT_SERVICES[key] = ForecastService(backend=backend, group_col=group_col, **kwargs)
+    return _DEFAULT_SERVICES[key]
+
+def main():
+    service = get_forecast_service(backend="holt_winters", group_col="store_location")
+    start = time.perf_counter()
+    service.get_forecasts(horizon=30)
+    cold = time.perf_counter() - start
+    start = time.perf_counter()
+    out = service.get_forecasts(horizon=14)
+    warm = time.perf_counter() - start
+    print(out.head(14).to_string(index=False))
+    print(f"cold {cold * 1000:.1f} ms, warm {warm * 1000:.2f} ms, stats {service.stats}")
+
+if __name__ == "__main__":
+    main()
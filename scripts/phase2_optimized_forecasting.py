@@ -1,9 +1,12 @@
 import pandas as pd
 import os
-from prophet import Prophet
+from typing import TYPE_CHECKING
 from utils import ensure_dir, save_csv
 from config import PATHS_OPT as PATHS
 
+if TYPE_CHECKING:
+    from prophet import Prophet
+
 def prepare_forecast_df(df: pd.DataFrame, date_col="transaction_date", target_col="revenue") -> pd.DataFrame:
     """
     Prepare DataFrame for Prophet.
@@ -12,15 +15,16 @@ def prepare_forecast_df(df: pd.DataFrame, date_col="transaction_date", target_co
     df["ds"] = pd.to_datetime(df["ds"])
     return df.groupby("ds")["y"].sum().reset_index()
 
-def train_prophet(df: pd.DataFrame) -> Prophet:
+def train_prophet(df: pd.DataFrame) -> "Prophet":
     """
     Train Prophet model on revenue data.
     """
+    from prophet import Prophet
     model = Prophet(daily_seasonality=True, weekly_seasonality=True, yearly_seasonality=True)
     model.fit(df)
     return model
 
-def forecast(model: Prophet, periods: int = 30) -> pd.DataFrame:
+def forecast(model: "Prophet", periods: int = 30) -> pd.DataFrame:
     """
     Forecast future revenue for given periods (days).
     """
@@ -28,15 +32,43 @@ def forecast(model: Prophet, periods: int = 30) -> pd.DataFrame:
     forecast_df = model.predict(future)
     return forecast_df[["ds", "yhat", "yhat_lower", "yhat_upper"]]
 
+FORECAST_BACKENDS = ("prophet", "seasonal_naive", "holt_winters", "ridge")
+
+def forecast_with_backend(df: pd.DataFrame, backend: str = "prophet", periods: int = 30) -> pd.DataFrame:
+    """
+    Fit the chosen backend on a prepare_forecast_df() frame and return the
+    ds/yhat/yhat_lower/yhat_upper frame. Non-Prophet backends run on the
+    vectorized engine in phase2_optimized_batch_forecasting.
+    """
+    if backend not in FORECAST_BACKENDS:
+        raise ValueError(f"Unknown forecast backend '{backend}', expected one of {FORECAST_BACKENDS}")
+    if backend == "prophet":
+        return forecast(train_prophet(df), periods=periods)
+    from phase2_optimized_batch_forecasting import series_from_ts, fit_batch, batch_forecast_frame
+    Y, keys, dates = series_from_ts(df)
+    model = fit_batch(Y, dates, method=backend)
+    return batch_forecast_frame(model, keys, periods=periods).drop(columns=["series"])
+
+def rolling_cv_prophet(df: pd.DataFrame, n_splits: int = 3, horizon: int = 30, n_jobs: int = None) -> pd.DataFrame:
+    """
+    Rolling-origin backtest of Prophet; horizon-wise RMSE/MAE/MAPE table.
+    """
+    from phase2_optimized_backtesting import backtest
+    by_horizon, _ = backtest(df, backend="prophet", horizon=horizon, n_splits=n_splits, n_jobs=n_jobs)
+    return by_horizon
+
 def export_forecast(df: pd.DataFrame, filename: str = "forecast.csv"):
     ensure_dir(PATHS["models"])
     out_path = os.path.join(PATHS["models"], filename)
     save_csv(df, out_path)
 
-if __name__ == "__main__":
+def main():
     raw = pd.read_csv(PATHS["phase1_clean"])
     df_prophet = prepare_forecast_df(raw)
     model = train_prophet(df_prophet)
     forecast_df = forecast(model, periods=30)
     export_forecast(forecast_df)
     print("Forecast generated and exported.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+import os
+import logging
+import numpy as np
+import pandas as pd
+
+from config import PATHS_OPT as PATHS
+from utils import ensure_dir, save_csv
+
+MODEL_DIR = PATHS["models"]
+CUBE_FILE = os.path.join(PATHS["features"], "intraday_cube.csv")
+INTRADAY_FORECAST_FILE = os.path.join(MODEL_DIR, "intraday_forecast.csv")
+
+CUBE_MEASURES = ("transactions", "qty", "revenue")
+
+def time_to_seconds(times: pd.Series) -> np.ndarray:
+    """
+    Seconds since midnight for transaction_time, whether it arrives as timedelta
+    (MySQL TIME via pymysql), datetime.time objects or 'HH:MM:SS' strings.
+    """
+    if pd.api.types.is_timedelta64_dtype(times):
+        td = times
+    else:
+        td = pd.to_timedelta(times.astype(str), errors="coerce")
+    secs = td.dt.total_seconds().to_numpy()
+    return np.where(np.isnan(secs), -1, secs % 86400).astype(np.int64)
+
+def encode_intraday(df: pd.DataFrame, group_col: str = "store_location", freq_minutes: int = 60,
+                    date_col: str = "transaction_date", time_col: str = "transaction_time"):
+    """
+    Integer codes (group, day, slot) for every transaction row.
+    Days are offsets from the first date so the day axis is contiguous;
+    rows without a date get day code -1, like a missing store or time.
+    """
+    if 1440 % freq_minutes != 0:
+        raise ValueError(f"freq_minutes must divide a day evenly, got {freq_minutes}")
+    group_codes, groups = pd.factorize(df[group_col], sort=True)
+    days = pd.to_datetime(df[date_col]).to_numpy().astype("datetime64[D]")
+    dated = ~np.isnat(days)
+    if not dated.any():
+        raise ValueError(f"No {date_col} values to build the intraday cube from")
+    if not dated.all():
+        logging.warning(f"[WARN] {int((~dated).sum())} rows without {date_col} left out of the intraday cube.")
+    first_day = days[dated].min()
+    day_codes = np.where(dated, (days - first_day).astype(np.int64), -1)
+    slot_codes = time_to_seconds(df[time_col]) // (freq_minutes * 60)
+    dates = pd.date_range(first_day, periods=int(day_codes.max()) + 1, freq="D")
+    return group_codes, day_codes, slot_codes, list(groups), dates
+
+def build_intraday_cube(df: pd.DataFrame, group_col: str = "store_location", freq_minutes: int = 60):
+    """
+    Bin transactions into a dense group × date × slot cube in one pass.
+    Returns (cube, groups, dates) where cube has shape
+    (len(CUBE_MEASURES), n_groups, n_days, n_slots).
+    """
+    g, d, s, groups, dates = encode_intraday(df, group_col=group_col, freq_minutes=freq_minutes)
+    n_slots = 1440 // freq_minutes
+    shape = (len(groups), len(dates), n_slots)
+    size = shape[0] * shape[1] * shape[2]
+    flat = (g * shape[1] + d) * n_slots + s
+    # rows with a missing store, date or unparseable time carry code -1
+    keep = (g >= 0) & (d >= 0) & (s >= 0)
+    flat = flat[keep]
+
+    qty = df["transaction_qty"].to_numpy(dtype=np.float64)[keep]
+    if "revenue" in df.columns:
+        revenue = df["revenue"].to_numpy(dtype=np.float64)[keep]
+    else:
+        revenue = qty * df["unit_price"].to_numpy(dtype=np.float64)[keep]
+
+    cube = np.empty((len(CUBE_MEASURES),) + shape, dtype=np.float64)
+    cube[0] = np.bincount(flat, minlength=size).reshape(shape)
+    cube[1] = np.bincount(flat, weights=qty, minlength=size).reshape(shape)
+    cube[2] = np.bincount(flat, weights=revenue, minlength=size).reshape(shape)
+    return cube, groups, dates
+
+def cube_to_frame(cube: np.ndarray, groups: list, dates: pd.DatetimeIndex, freq_minutes: int = 60,
+                  group_col: str = "store_location", measures=CUBE_MEASURES, drop_empty: bool = True) -> pd.DataFrame:
+    """
+    Long-format view of a (measure × group × date × slot) cube.
+    """
+    _, n_groups, n_days, n_slots = cube.shape
+    g, d, s = np.meshgrid(np.arange(n_groups), np.arange(n_days), np.arange(n_slots), indexing="ij")
+    out = pd.DataFrame({
+        group_col: np.asarray(groups, dtype=object)[g.ravel()],
+        "ds": dates[d.ravel()] + pd.to_timedelta(s.ravel() * freq_minutes, unit="min"),
+    })
+    for i, name in enumerate(measures):
+        out[name] = cube[i].ravel()
+    if drop_empty:
+        out = out[cube.sum(axis=0).ravel() != 0].reset_index(drop=True)
+    return out
+
+def forecast_intraday(cube: np.ndarray, dates: pd.DatetimeIndex, horizon_days: int = 7, n_weeks: int = 4,
+                      measure: str = "transactions") -> tuple:
+    """
+    Batch seasonal forecast for every group at once: each future slot is the
+    mean of the same weekday/slot over the last n_weeks full weeks.
+    Returns (yhat, yhat_lower, yhat_upper, future_dates), arrays of shape
+    (n_groups, horizon_days, n_slots).
+    """
+    series = cube[CUBE_MEASURES.index(measure)]
+    n_groups, n_days, n_slots = series.shape
+    n_weeks = max(1, min(n_weeks, n_days // 7))
+    window = series[:, n_days - n_weeks * 7:, :].reshape(n_groups, n_weeks, 7, n_slots)
+    profile = window.mean(axis=1)
+    spread = window.std(axis=1)
+    # the window length is a multiple of 7, so day k after the window lines up with profile[k % 7]
+    pos = np.arange(horizon_days) % 7
+    yhat = profile[:, pos, :]
+    band = 1.96 * spread[:, pos, :]
+    future_dates = pd.date_range(dates[-1] + pd.Timedelta(days=1), periods=horizon_days, freq="D")
+    return yhat, np.clip(yhat - band, 0, None), yhat + band, future_dates
+
+def staffing_requirements(load: np.ndarray, per_staff: float = 20.0, min_staff: int = 1) -> np.ndarray:
+    """
+    Staff needed per slot given forecast load (e.g. transactions per hour) and
+    how much of that load one person can serve per slot.
+    """
+    return np.maximum(np.ceil(load / per_staff), min_staff).astype(np.int64)
+
+def forecast_intraday_df(df: pd.DataFrame, group_col: str = "store_location", freq_minutes: int = 60,
+                         horizon_days: int = 7, n_weeks: int = 4, per_staff: float = 20.0) -> pd.DataFrame:
+    """
+    Hourly (or sub-hourly) transaction forecast and staffing per store in the
+    ds/yhat/yhat_lower/yhat_upper layout used by forecast().
+    """
+    cube, groups, dates = build_intraday_cube(df, group_col=group_col, freq_minutes=freq_minutes)
+    yhat, lower, upper, future_dates = forecast_intraday(cube, dates, horizon_days=horizon_days, n_weeks=n_weeks)
+    staff = staffing_requirements(upper, per_staff=per_staff)
+    # open hours only: slots that never saw a transaction stay out of the output
+    open_slots = cube[0].sum(axis=1) > 0
+    n_groups, _, n_slots = yhat.shape
+    g, d, s = np.meshgrid(np.arange(n_groups), np.arange(horizon_days), np.arange(n_slots), indexing="ij")
+    keep = open_slots[g.ravel(), s.ravel()]
+    out = pd.DataFrame({
+        group_col: np.asarray(groups, dtype=object)[g.ravel()[keep]],
+        "ds": future_dates[d.ravel()[keep]] + pd.to_timedelta(s.ravel()[keep] * freq_minutes, unit="min"),
+        "yhat": yhat.ravel()[keep],
+        "yhat_lower": lower.ravel()[keep],
+        "yhat_upper": upper.ravel()[keep],
+        "staff_required": staff.ravel()[keep],
+    })
+    return out
+
+def export_intraday(df: pd.DataFrame, path: str):
+    ensure_dir(os.path.dirname(path))
+    save_csv(df, path)
+
+def main():
+    raw = pd.read_csv(PATHS["phase1_clean"], parse_dates=["transaction_date"])
+    cube, stores, dates = build_intraday_cube(raw, freq_minutes=60)
+    export_intraday(cube_to_frame(cube, stores, dates, freq_minutes=60), CUBE_FILE)
+    export_intraday(forecast_intraday_df(raw, freq_minutes=60, horizon_days=7), INTRADAY_FORECAST_FILE)
+    print(f"Intraday forecast saved -> {INTRADAY_FORECAST_FILE}")
+
+if __name__ == "__main__":
+    main()
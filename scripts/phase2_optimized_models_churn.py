@@ -1,34 +1,66 @@
 import os
 import json
+import logging
 import pandas as pd
-import joblib
 import numpy as np
-from sklearn.linear_model import LogisticRegression
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.model_selection import StratifiedKFold, GridSearchCV, train_test_split
-from sklearn.metrics import roc_auc_score, accuracy_score, f1_score
-import shap
-import matplotlib.pyplot as plt
+from typing import TYPE_CHECKING
 
 from config import PATHS_OPT as PATHS
 from utils import ensure_dir, save_csv, safe_save_plot
+from phase2_optimized_registry import get_registry
+
+# sklearn, shap and matplotlib are imported inside the functions that use them
+# so importing this module (e.g. from the CLI) stays cheap.
+if TYPE_CHECKING:
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.ensemble import RandomForestClassifier, HistGradientBoostingClassifier
 
 MODEL_DIR = PATHS["models"]
 HYPERPARAMS_FILE = os.path.join(MODEL_DIR, "hyperparams_rf.json")
-LR_MODEL_FILE = os.path.join(MODEL_DIR, "lr_churn.joblib")
-RF_MODEL_FILE = os.path.join(MODEL_DIR, "rf_churn.joblib")
+# registry names; artifacts are versioned under PATHS["models"]/registry
+LR_MODEL_NAME = "lr_churn"
+RF_MODEL_NAME = "rf_churn"
+HGB_MODEL_NAME = "hgb_churn"
 SHAP_SUMMARY_FILE = os.path.join(PATHS["logs"], "shap_summary.png")
 PRED_CSV_LR = os.path.join(MODEL_DIR, "lr_churn_predictions.csv")
 PRED_CSV_RF = os.path.join(MODEL_DIR, "rf_churn_predictions.csv")
+# labels the models were trained and evaluated against, keyed like the prediction files
+CHURN_LABELS_FILE = os.path.join(MODEL_DIR, "churn_labels.csv")
+
+CHURN_BACKENDS = ("rf", "hgb")
+CATEGORICAL_COLS = ("store_location", "product_id")
+# HistGradientBoosting bins categories into at most 255 codes
+MAX_CATEGORIES = 255
+# exported predictions carry a split column; metrics and CIs use the HOLDOUT rows only
+SPLIT_COL = "split"
+HOLDOUT = "test"
+HOLDOUT_SIZE = 0.2
+
+def save_model(name: str, model, X: pd.DataFrame = None, compress: int = None) -> str:
+    """
+    Register `model` as a new version of `name` and make it the active one.
+    compress=None lets the registry compress tree models (RF) and keep the rest mappable.
+    """
+    features = list(X.columns) if X is not None else None
+    return get_registry().register(name, model, features=features, compress=compress, promote=True)
+
+def load_model(name: str, version: str = None):
+    """Active (or given) version of a registered model; see ModelRegistry.load."""
+    return get_registry().load(name, version=version)
 
-def train_logistic_regression(X: pd.DataFrame, y: pd.Series) -> LogisticRegression:
+def train_logistic_regression(X: pd.DataFrame, y: pd.Series) -> "LogisticRegression":
+    from sklearn.linear_model import LogisticRegression
     model = LogisticRegression(max_iter=2000, class_weight="balanced", solver="liblinear")
     model.fit(X, y)
-    ensure_dir(MODEL_DIR)
-    joblib.dump(model, LR_MODEL_FILE)
+    save_model(LR_MODEL_NAME, model, X)
     return model
 
-def tune_random_forest(X: pd.DataFrame, y: pd.Series, cv_splits: int = 3) -> RandomForestClassifier:
+def tune_random_forest(X: pd.DataFrame, y: pd.Series, cv_splits: int = 3, warm_start: bool = False,
+                       **warm_start_kwargs) -> "RandomForestClassifier":
+    if warm_start:
+        return tune_random_forest_warm_start(X, y, cv_splits=cv_splits, **warm_start_kwargs)
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.model_selection import StratifiedKFold, GridSearchCV
     param_grid = {
         "n_estimators": [100, 200],
         "max_depth": [6, 10, None],
@@ -41,16 +73,163 @@ def tune_random_forest(X: pd.DataFrame, y: pd.Series, cv_splits: int = 3) -> Ran
     ensure_dir(MODEL_DIR)
     with open(HYPERPARAMS_FILE, "w") as f:
         json.dump(gs.best_params_, f, indent=2)
-    joblib.dump(gs.best_estimator_, RF_MODEL_FILE)
+    save_model(RF_MODEL_NAME, gs.best_estimator_, X)
     return gs.best_estimator_
 
-def train_random_forest(X: pd.DataFrame, y: pd.Series, n_estimators: int = 200) -> RandomForestClassifier:
+RF_CHECKPOINTS = (50, 100, 200, 400)
+
+def _grow_forests(forests: list, score_fn, checkpoints: tuple, tol: float) -> dict:
+    """
+    Grow warm-started forests checkpoint by checkpoint, scoring after each,
+    until the mean score improves by less than tol. Only the new trees are
+    fitted at every step. Returns {n_estimators: score}.
+    """
+    curve = {}
+    best = -np.inf
+    for n in checkpoints:
+        scores = []
+        for model, fit_args, eval_args in forests:
+            model.set_params(n_estimators=n)
+            model.fit(*fit_args)
+            scores.append(score_fn(model, *eval_args))
+        curve[n] = float(np.mean(scores))
+        if curve[n] - best < tol and len(curve) > 1:
+            break
+        best = max(best, curve[n])
+    return curve
+
+def tune_random_forest_warm_start(X: pd.DataFrame, y: pd.Series, cv_splits: int = 3,
+                                  checkpoints: tuple = RF_CHECKPOINTS, max_depths: tuple = (6, 10, None),
+                                  min_samples_splits: tuple = (2, 5), scoring: str = "oob",
+                                  tol: float = 1e-3) -> "RandomForestClassifier":
+    """
+    RF tuning that grows each forest incrementally (warm_start) and scores it
+    at every checkpoint, either on out-of-bag samples (scoring="oob", one
+    forest per combination) or on stratified CV folds (scoring="cv"). Growth
+    stops once AUC plateaus, so no tree is fitted twice and sizes past the
+    plateau are never fitted at all. The best size goes to hyperparams_rf.json.
+    """
+    from itertools import product
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.metrics import roc_auc_score
+    from sklearn.model_selection import StratifiedKFold
+    if scoring not in ("oob", "cv"):
+        raise ValueError(f"scoring must be 'oob' or 'cv', got '{scoring}'")
+    from sklearn.utils.class_weight import compute_class_weight
+    X_arr, y_arr = np.asarray(X), np.asarray(y)
+    # explicit "balanced" weights from the full target: the preset is re-derived per
+    # fit call, which sklearn discourages together with warm_start
+    classes = np.unique(y_arr)
+    class_weight = dict(zip(classes, compute_class_weight("balanced", classes=classes, y=y_arr)))
+
+    def oob_auc(model):
+        oob = model.oob_decision_function_[:, 1]
+        seen = ~np.isnan(oob)
+        return roc_auc_score(y_arr[seen], oob[seen])
+
+    def fold_auc(model, X_val, y_val):
+        return roc_auc_score(y_val, model.predict_proba(X_val)[:, 1])
+
+    best = {"score": -np.inf}
+    for max_depth, min_samples_split in product(max_depths, min_samples_splits):
+        params = {"max_depth": max_depth, "min_samples_split": min_samples_split}
+        def make():
+            return RandomForestClassifier(class_weight=class_weight, random_state=42, n_jobs=-1,
+                                          warm_start=True, oob_score=(scoring == "oob"), **params)
+        if scoring == "oob":
+            forests = [(make(), (X, y), ())]
+            curve = _grow_forests(forests, oob_auc, checkpoints, tol)
+        else:
+            cv = StratifiedKFold(n_splits=cv_splits, shuffle=True, random_state=42)
+            forests = [(make(), (X_arr[tr], y_arr[tr]), (X_arr[va], y_arr[va])) for tr, va in cv.split(X_arr, y_arr)]
+            curve = _grow_forests(forests, fold_auc, checkpoints, tol)
+        n_best = max(curve, key=curve.get)
+        logging.info(f"[TUNE] RF {params} {scoring} AUC by size: {curve}")
+        if curve[n_best] > best["score"]:
+            best = {"score": curve[n_best], "params": {"n_estimators": n_best, **params},
+                    "forest": forests[0][0] if scoring == "oob" else None}
+
+    if best["forest"] is not None:
+        # trees are independent, so the first n_best trees are exactly a forest of that size
+        model = best["forest"]
+        model.estimators_ = model.estimators_[:best["params"]["n_estimators"]]
+        # the OOB attributes still describe the untrimmed forest; the tuned OOB AUC is in the curve log
+        del model.oob_score_, model.oob_decision_function_
+        model.set_params(n_estimators=best["params"]["n_estimators"], warm_start=False, oob_score=False)
+    else:
+        # same explicit weights as the tuned fold forests
+        model = RandomForestClassifier(class_weight=class_weight, random_state=42, n_jobs=-1, **best["params"])
+        model.fit(X, y)
+    ensure_dir(MODEL_DIR)
+    with open(HYPERPARAMS_FILE, "w") as f:
+        json.dump(best["params"], f, indent=2)
+    save_model(RF_MODEL_NAME, model, X)
+    return model
+
+def train_random_forest(X: pd.DataFrame, y: pd.Series, n_estimators: int = 200) -> "RandomForestClassifier":
+    from sklearn.ensemble import RandomForestClassifier
     model = RandomForestClassifier(n_estimators=n_estimators, random_state=42, class_weight="balanced")
     model.fit(X, y)
-    ensure_dir(MODEL_DIR)
-    joblib.dump(model, RF_MODEL_FILE)
+    save_model(RF_MODEL_NAME, model, X)
     return model
 
+def prepare_hgb_features(X: pd.DataFrame, keys: pd.DataFrame = None, categories: dict = None):
+    """
+    float32 feature matrix for the histogram backend. Key columns (store,
+    product) are appended as integer category codes so the model can split on
+    them natively. Pass the categories returned at training time when
+    preparing new data so codes line up; unseen values become NaN.
+    Returns (X32, categories).
+    """
+    X32 = X.astype(np.float32)
+    categories = {} if categories is None else categories
+    if keys is not None:
+        X32 = X32.copy()
+        for col in CATEGORICAL_COLS:
+            if col not in keys.columns:
+                continue
+            if col not in categories:
+                cats = pd.Index(pd.unique(keys[col].dropna())).sort_values()
+                if len(cats) > MAX_CATEGORIES:
+                    # too many levels for native categorical splits; leave the column out
+                    continue
+                categories[col] = cats
+            codes = pd.Categorical(keys[col], categories=categories[col]).codes.astype(np.float32)
+            codes[codes < 0] = np.nan
+            X32[col] = codes
+    return X32, categories
+
+def train_hist_gradient_boosting(X: pd.DataFrame, y: pd.Series, categories: dict = None,
+                                 max_iter: int = 500, learning_rate: float = 0.1,
+                                 validation_fraction: float = 0.2, n_iter_no_change: int = 20) -> "HistGradientBoostingClassifier":
+    """
+    Histogram gradient boosting with early stopping on a held-out validation
+    split. Columns named in `categories` (from prepare_hgb_features) are
+    treated as native categorical features.
+    """
+    from sklearn.ensemble import HistGradientBoostingClassifier
+    cat_mask = [c in (categories or {}) for c in X.columns]
+    model = HistGradientBoostingClassifier(
+        max_iter=max_iter,
+        learning_rate=learning_rate,
+        categorical_features=cat_mask if any(cat_mask) else None,
+        early_stopping=True,
+        validation_fraction=validation_fraction,
+        n_iter_no_change=n_iter_no_change,
+        scoring="roc_auc",
+        class_weight="balanced",
+        random_state=42,
+    )
+    model.fit(X, y)
+    save_model(HGB_MODEL_NAME, model, X)
+    return model
+
+def holdout_split(y: pd.Series, test_size: float = HOLDOUT_SIZE) -> pd.Series:
+    """"train" / HOLDOUT label per row of y: a stratified split with a fixed seed."""
+    from sklearn.model_selection import train_test_split
+    _, test_index = train_test_split(y.index, stratify=y, test_size=test_size, random_state=42)
+    return pd.Series("train", index=y.index).mask(y.index.isin(test_index), HOLDOUT)
+
 def predict(model, X: pd.DataFrame) -> pd.Series:
     preds = model.predict(X)
     return pd.Series(preds, index=X.index)
@@ -61,21 +240,55 @@ def predict_proba(model, X: pd.DataFrame) -> pd.Series:
     # fallback for linear models with decision function
     return pd.Series(model.decision_function(X), index=X.index)
 
-def evaluate(y_true: pd.Series, y_pred: pd.Series) -> dict:
+def evaluate(y_true: pd.Series, y_pred: pd.Series, y_score: pd.Series = None) -> dict:
+    """Accuracy / F1 on hard labels; ROC AUC on y_score (probabilities) when given."""
+    from sklearn.metrics import roc_auc_score, accuracy_score, f1_score
     y_t = np.array(y_true)
     y_p = np.array(y_pred)
+    y_s = np.array(y_score) if y_score is not None else y_p
     res = {
         "accuracy": float(accuracy_score(y_t, y_p)),
-        "roc_auc": float(roc_auc_score(y_t, y_p)),
+        "roc_auc": float(roc_auc_score(y_t, y_s)),
         "f1": float(f1_score(y_t, y_p))
     }
     return res
 
-def export_predictions(preds: pd.Series, filename: str):
+def export_predictions(preds: pd.Series, filename: str, proba: pd.Series = None, keys: pd.DataFrame = None,
+                       split: pd.Series = None):
+    """
+    Write predictions (and probabilities) to MODEL_DIR/filename. With keys, the
+    entity columns are written first so evaluation joins labels on them
+    instead of relying on row order; split (from holdout_split) marks which
+    rows the model was trained on.
+    """
     ensure_dir(MODEL_DIR)
-    save_csv(pd.DataFrame({"prediction": preds}), os.path.join(MODEL_DIR, filename))
+    out = pd.DataFrame({"prediction": preds})
+    if proba is not None:
+        out["probability"] = proba
+    if split is not None:
+        out[SPLIT_COL] = split.loc[out.index]
+    if keys is not None:
+        out = pd.concat([keys.loc[out.index], out], axis=1)
+    save_csv(out, os.path.join(MODEL_DIR, filename))
+
+def export_churn_labels(keys: pd.DataFrame, y: pd.Series, as_of, churn_days: int, path: str = CHURN_LABELS_FILE):
+    """
+    Store churn_flag per entity key with the as_of / churn_days that defined
+    it, so evaluation reuses these labels instead of re-deriving them from
+    whatever clean_sales.csv holds later.
+    """
+    ensure_dir(os.path.dirname(path))
+    out = keys.assign(churn_flag=y, as_of=str(pd.Timestamp(as_of).date()), churn_days=churn_days)
+    save_csv(out, path)
+
+def load_churn_labels(path: str = CHURN_LABELS_FILE) -> pd.DataFrame:
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No stored churn labels at {path}; re-run the churn stage")
+    return pd.read_csv(path)
 
 def log_shap(model, X: pd.DataFrame, out_path: str = SHAP_SUMMARY_FILE):
+    import shap
+    import matplotlib.pyplot as plt
     # SHAP for tree models uses TreeExplainer; for linear, KernelExplainer fallback
     ensure_dir(PATHS["logs"])
     explainer = shap.TreeExplainer(model) if hasattr(shap, "TreeExplainer") else shap.KernelExplainer(model.predict, X.iloc[:50,:])
@@ -88,36 +301,41 @@ def log_shap(model, X: pd.DataFrame, out_path: str = SHAP_SUMMARY_FILE):
     safe_save_plot(fig, out_path)
     plt.close(fig)
 
-if __name__ == "__main__":
-    # Load features and target
-    feats_path = os.path.join(PATHS["features"], "features.csv")
-    df = pd.read_csv(feats_path, parse_dates=["transaction_date"])
-    # choose columns for modeling
-    # exclude identifiers and target if present; adapt to your feature columns
-    drop_cols = ["transaction_id", "product_id", "product_category", "transaction_date", "store_location"]
-    X = df.drop(columns=[c for c in drop_cols if c in df.columns], errors="ignore").fillna(0)
-    # target must be present in phase1 clean or features: 'churn_flag'
-    y = pd.read_csv(PATHS["phase1_clean"])["churn_flag"]
-    # align lengths if needed
-    if len(y) != len(X):
-        y = y.iloc[:len(X)].reset_index(drop=True)
-        X = X.reset_index(drop=True).iloc[:len(y)]
-
-    # split for quick local tuning
-    X_train, X_test, y_train, y_test = train_test_split(X, y, stratify=y, test_size=0.2, random_state=42)
+def main():
+    from phase2_optimized_entities import build_churn_dataset, churn_as_of, CHURN_ENTITY_COLS
+    # entity-level features and inactivity-based churn labels, aligned by construction
+    raw = pd.read_csv(PATHS["phase1_clean"], parse_dates=["transaction_date"])
+    churn_days = 90
+    as_of = churn_as_of(raw, churn_days)
+    X, y, keys = build_churn_dataset(raw, entity_cols=CHURN_ENTITY_COLS, as_of=as_of, churn_days=churn_days)
+    export_churn_labels(keys, y, as_of, churn_days)
+
+    # held-out split: exported predictions cover the test rows only
+    split = holdout_split(y)
+    X_train, X_test = X[split != HOLDOUT], X[split == HOLDOUT]
+    y_train, y_test = y[split != HOLDOUT], y[split == HOLDOUT]
 
     lr = train_logistic_regression(X_train, y_train)
     rf = tune_random_forest(X_train, y_train, cv_splits=3)
+    X_hgb, cats = prepare_hgb_features(X, keys)
+    hgb = train_hist_gradient_boosting(X_hgb.loc[X_train.index], y_train, categories=cats)
 
     lr_preds = predict(lr, X_test)
     rf_preds = predict(rf, X_test)
+    hgb_preds = predict(hgb, X_hgb.loc[X_test.index])
 
-    lr_metrics = evaluate(y_test, lr_preds)
-    rf_metrics = evaluate(y_test, rf_preds)
+    lr_proba = predict_proba(lr, X_test)
+    rf_proba = predict_proba(rf, X_test)
+    hgb_proba = predict_proba(hgb, X_hgb.loc[X_test.index])
+
+    lr_metrics = evaluate(y_test, lr_preds, lr_proba)
+    rf_metrics = evaluate(y_test, rf_preds, rf_proba)
+    hgb_metrics = evaluate(y_test, hgb_preds, hgb_proba)
 
     # export
-    export_predictions(pd.Series(lr_preds, index=X_test.index), "lr_churn_predictions.csv")
-    export_predictions(pd.Series(rf_preds, index=X_test.index), "rf_churn_predictions.csv")
+    export_predictions(pd.Series(lr_preds, index=X_test.index), "lr_churn_predictions.csv", lr_proba, keys, split)
+    export_predictions(pd.Series(rf_preds, index=X_test.index), "rf_churn_predictions.csv", rf_proba, keys, split)
+    export_predictions(hgb_preds, "hgb_churn_predictions.csv", hgb_proba, keys, split)
     # log shap for rf
     try:
         log_shap(rf, X_train)
@@ -127,3 +345,7 @@ if __name__ == "__main__":
     print("Churn training complete. Metrics:")
     print("LR:", lr_metrics)
     print("RF:", rf_metrics)
+    print("HGB:", hgb_metrics)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+import numpy as np
+import pandas as pd
+
+from config import PATHS_OPT as PATHS
+from utils import ensure_dir
+
+INDEX_DIR = os.path.join(PATHS["models"], "neighbor_index")
+
+# one .npy per array so every worker can np.load(..., mmap_mode="r") the same pages
+INDEX_FILES = {
+    "neighbors": "neighbors.npy",
+    "scores": "scores.npy",
+    "product_ids": "product_ids.npy",
+    "row_of_id": "row_of_id.npy",
+}
+META_FILE = "meta.json"
+# <index_dir>/CURRENT names the build directory readers open
+CURRENT_FILE = "CURRENT"
+KEEP_BUILDS = 2
+
+def topk_rows(sim_rows: np.ndarray, row_ids: np.ndarray, top_k: int = 20):
+    """
+    Top-k neighbours for a block of similarity rows; row_ids gives each row's
+    own item so it is excluded. Non-positive scores are treated as "no
+    neighbour" and padded with -1 / nan.
+    """
+    sim = np.array(sim_rows, dtype=np.float32)
+    m, n = sim.shape
+    sim[np.arange(m), row_ids] = -np.inf
+    k = min(top_k, n - 1)
+    neighbors = np.full((m, top_k), -1, dtype=np.int32)
+    scores = np.full((m, top_k), np.nan, dtype=np.float32)
+    if k > 0 and m > 0:
+        top = np.argpartition(-sim, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(sim, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind="stable")
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+        keep = top_scores > 0
+        neighbors[:, :k] = np.where(keep, top, -1)
+        scores[:, :k] = np.where(keep, top_scores, np.nan)
+    return neighbors, scores
+
+def build_neighbor_index(sim_matrix: np.ndarray, prod_ids: list, top_k: int = 20):
+    """
+    Fixed-width top-k neighbour table from an item similarity matrix.
+    Returns (neighbors, scores): int32 row indices and float32 scores of shape
+    (n_items, top_k), best first, padded with -1 / nan when fewer items exist.
+    """
+    n = len(prod_ids)
+    return topk_rows(sim_matrix, np.arange(n), top_k=top_k)
+
+def save_neighbor_index(neighbors: np.ndarray, scores: np.ndarray, prod_ids: list, index_dir: str = INDEX_DIR):
+    """
+    Persist the index as plain .npy files. product_id -> row is a dense lookup
+    array indexed by product_id (-1 for unknown ids), so lookups are O(1).
+    Every build goes to its own <index_dir>/<version>/ directory (version =
+    content hash) and is published by rewriting the one-line CURRENT file, so
+    a reader always opens the four arrays of a single build.
+    """
+    ids = np.asarray(prod_ids, dtype=np.int64)
+    if ids.size and ids.min() < 0:
+        raise ValueError("product ids must be non-negative integers")
+    row_of_id = np.full(int(ids.max()) + 1 if ids.size else 0, -1, dtype=np.int32)
+    row_of_id[ids] = np.arange(ids.size, dtype=np.int32)
+    arrays = {name: np.ascontiguousarray(arr) for name, arr in
+              {"neighbors": neighbors, "scores": scores, "product_ids": ids, "row_of_id": row_of_id}.items()}
+    h = hashlib.sha256()
+    for name, arr in arrays.items():
+        h.update(f"{name}{arr.dtype}{arr.shape}".encode())
+        h.update(arr.tobytes())
+    version = h.hexdigest()[:16]
+
+    ensure_dir(index_dir)
+    build_dir = os.path.join(index_dir, version)
+    if not os.path.isdir(build_dir):
+        tmp_dir = tempfile.mkdtemp(dir=index_dir, prefix=".build-")
+        try:
+            for name, arr in arrays.items():
+                np.save(os.path.join(tmp_dir, INDEX_FILES[name]), arr)
+            meta = {"version": version, "n_items": int(ids.size), "top_k": int(neighbors.shape[1])}
+            with open(os.path.join(tmp_dir, META_FILE), "w") as f:
+                json.dump(meta, f, indent=2)
+            os.rename(tmp_dir, build_dir)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp = os.path.join(index_dir, CURRENT_FILE + ".tmp")
+    with open(tmp, "w") as f:
+        f.write(version)
+    os.replace(tmp, os.path.join(index_dir, CURRENT_FILE))
+    _prune_builds(index_dir, keep=version)
+    return index_dir
+
+def current_build(index_dir: str = INDEX_DIR) -> str:
+    """Directory of the published build."""
+    path = os.path.join(index_dir, CURRENT_FILE)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No neighbor index published in {index_dir}; run the neighbor-index stage")
+    with open(path) as f:
+        return os.path.join(index_dir, f.read().strip())
+
+def _prune_builds(index_dir: str, keep: str, n_keep: int = KEEP_BUILDS):
+    """
+    Remove old build directories, newest n_keep kept, so a reader that read
+    CURRENT just before a switch can still open the build it was pointed at.
+    """
+    builds = [d for d in os.listdir(index_dir) if not d.startswith(".") and d != keep
+              and os.path.exists(os.path.join(index_dir, d, META_FILE))]
+    builds.sort(key=lambda d: os.path.getmtime(os.path.join(index_dir, d)), reverse=True)
+    for d in builds[n_keep - 1:]:
+        shutil.rmtree(os.path.join(index_dir, d), ignore_errors=True)
+
+class NeighborIndex:
+    """
+    Read-only view over a saved neighbour index. Arrays are memory-mapped, so
+    opening is cheap and worker processes share one copy through the page cache.
+    CURRENT is read once, so all arrays come from the same build even if a
+    rebuild is published meanwhile; open a new NeighborIndex to pick it up.
+    """
+
+    def __init__(self, index_dir: str = INDEX_DIR):
+        self.index_dir = index_dir
+        self.build_dir = current_build(index_dir)
+        self.neighbors = np.load(os.path.join(self.build_dir, INDEX_FILES["neighbors"]), mmap_mode="r")
+        self.scores = np.load(os.path.join(self.build_dir, INDEX_FILES["scores"]), mmap_mode="r")
+        self.product_ids = np.load(os.path.join(self.build_dir, INDEX_FILES["product_ids"]), mmap_mode="r")
+        self.row_of_id = np.load(os.path.join(self.build_dir, INDEX_FILES["row_of_id"]), mmap_mode="r")
+
+    def __len__(self):
+        return self.product_ids.shape[0]
+
+    def row(self, product_id) -> int:
+        pid = int(product_id)
+        if pid < 0 or pid >= self.row_of_id.shape[0]:
+            return -1
+        return int(self.row_of_id[pid])
+
+    def recommend(self, product_id, top_k: int = 5) -> list:
+        """Top-k (product_id, score) pairs for one product; [] if unknown."""
+        r = self.row(product_id)
+        if r < 0:
+            return []
+        nbrs = self.neighbors[r, :top_k]
+        valid = nbrs >= 0
+        return list(zip(self.product_ids[nbrs[valid]].tolist(), self.scores[r, :top_k][valid].tolist()))
+
+    def recommend_basket(self, basket, top_k: int = 5) -> list:
+        """
+        Top-k for a whole basket: neighbour scores are summed across the
+        basket's items and items already in the basket are skipped.
+        """
+        rows = np.array([r for r in (self.row(p) for p in basket) if r >= 0], dtype=np.int64)
+        if rows.size == 0:
+            return []
+        nbrs = np.asarray(self.neighbors[rows]).ravel()
+        scores = np.asarray(self.scores[rows]).ravel()
+        valid = nbrs >= 0
+        nbrs, scores = nbrs[valid], scores[valid]
+        uniq, inv = np.unique(nbrs, return_inverse=True)
+        total = np.bincount(inv, weights=scores)
+        total[np.isin(uniq, rows)] = -np.inf
+        best = np.argsort(-total, kind="stable")[:top_k]
+        best = best[np.isfinite(total[best])]
+        return list(zip(self.product_ids[uniq[best]].tolist(), total[best].tolist()))
+
+    def to_frame(self, top_k: int = None) -> pd.DataFrame:
+        """Long product_id / recommended_product_id / score view, as in recommend_topk()."""
+        k = top_k or self.neighbors.shape[1]
+        nbrs = np.asarray(self.neighbors[:, :k])
+        rows = np.repeat(np.arange(len(self)), k)
+        flat = nbrs.ravel()
+        valid = flat >= 0
+        return pd.DataFrame({
+            "product_id": np.asarray(self.product_ids)[rows[valid]],
+            "recommended_product_id": np.asarray(self.product_ids)[flat[valid]],
+            "score": np.asarray(self.scores[:, :k]).ravel()[valid],
+        })
+
+def main():
+    from phase2_optimized_recommender import build_item_matrix, build_item_similarity
+    raw = pd.read_csv(PATHS["phase1_clean"])
+    matrix, prod_ids, _ = build_item_matrix(raw)
+    sim = build_item_similarity(matrix)
+    neighbors, scores = build_neighbor_index(sim, prod_ids, top_k=20)
+    save_neighbor_index(neighbors, scores, prod_ids)
+    print(f"Neighbor index saved -> {INDEX_DIR}")
+
+if __name__ == "__main__":
+    main()
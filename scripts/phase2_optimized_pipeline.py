@@ -1,72 +1,119 @@
 import os
 import pandas as pd
 
+import config
 from config import PATHS_OPT as PATHS
-from phase2_optimized_feature_engineering import build_feature_matrix, export_features, build_feature_matrix as gen_features
+from utils import save_csv
+from phase2_optimized_feature_engineering import (build_feature_matrix, export_features, build_feature_matrix as gen_features,
+                                                  build_store_features, export_store_features)
+from phase2_optimized_entities import build_churn_dataset, churn_as_of, export_entities, CHURN_ENTITY_COLS
 from phase2_optimized_models_churn import (train_logistic_regression, train_random_forest,
-                                           tune_random_forest, predict, export_predictions, log_shap)
-from phase2_optimized_forecasting import prepare_forecast_df, train_prophet, forecast, rolling_cv_prophet
+                                           tune_random_forest, predict, predict_proba, export_predictions, log_shap,
+                                           prepare_hgb_features, train_hist_gradient_boosting, CHURN_BACKENDS,
+                                           LR_MODEL_NAME, RF_MODEL_NAME, HGB_MODEL_NAME, holdout_split, HOLDOUT,
+                                           export_churn_labels)
+from phase2_optimized_registry import get_registry
+from phase2_optimized_forecasting import prepare_forecast_df, forecast_with_backend
+from phase2_optimized_backtesting import backtest, export_backtest, summarize_backtest
 from phase2_optimized_recommender import build_item_matrix, build_item_similarity, recommend_topk, export_recommendations
+from phase2_optimized_neighbor_index import build_neighbor_index, save_neighbor_index
+from phase2_optimized_basket import mine_rules, export_rules, rules_to_recommendations, BASKET_RECS_FILE
 from phase2_optimized_evaluate import evaluate_forecast, evaluate_classification, evaluate_recommendations, export_metrics
+from phase2_optimized_bootstrap import bootstrap_classification, bootstrap_forecast, export_bootstrap
 
-def run_phase2_optimized(horizon: int = 30, tune_rf: bool = True):
+def run_phase2_optimized(horizon: int = 30, tune_rf: bool = True, forecast_backend: str = "prophet",
+                         basket_min_support: float = 0.001, churn_days: int = 90, churn_backend: str = "rf"):
+    if churn_backend not in CHURN_BACKENDS:
+        raise ValueError(f"Unknown churn backend '{churn_backend}', expected one of {CHURN_BACKENDS}")
+    config.setup_logging()
     raw = pd.read_csv(PATHS["phase1_clean"], parse_dates=["transaction_date"])
     # features
     from phase2_optimized_feature_engineering import build_feature_matrix as build_feats
-    feats = build_feats(raw)
+    # store-level category mix stays a per-store table keyed by store_code
+    feats = build_feats(raw, broadcast_store_features=False)
     export_features(feats)
+    export_store_features(build_store_features(raw))
 
-    # prepare X, y for churn
-    drop_cols = ["transaction_id", "product_id", "product_category", "transaction_date", "store_location"]
-    X = feats.drop(columns=[c for c in drop_cols if c in feats.columns], errors="ignore").fillna(0)
-    y_full = pd.read_csv(PATHS["phase1_clean"])["churn_flag"]
-    y = y_full.iloc[:len(X)].reset_index(drop=True)
-
-    # train churn models
-    lr = train_logistic_regression(X, y)
-    if tune_rf:
-        rf = tune_random_forest(X, y)
-    else:
-        rf = train_random_forest(X, y)
+    # prepare X, y for churn: one row per store × product, labelled by inactivity
+    as_of = churn_as_of(raw, churn_days)
+    X, y, churn_keys = build_churn_dataset(raw, entity_cols=CHURN_ENTITY_COLS, as_of=as_of, churn_days=churn_days)
+    export_churn_labels(churn_keys, y, as_of, churn_days)
+    export_entities(pd.concat([churn_keys, X, y], axis=1))
 
+    # train churn models on the train split; every entity is scored, the held-out rows are evaluated
+    split = holdout_split(y)
+    test = (split == HOLDOUT).to_numpy()
+    X_train, y_train = X[~test], y[~test]
+    lr = train_logistic_regression(X_train, y_train)
     lr_preds = predict(lr, X)
-    rf_preds = predict(rf, X)
-    export_predictions(lr_preds, "lr_churn_predictions.csv")
-    export_predictions(rf_preds, "rf_churn_predictions.csv")
+    lr_proba = predict_proba(lr, X)
+    export_predictions(lr_preds, "lr_churn_predictions.csv", lr_proba, churn_keys, split)
+    if churn_backend == "hgb":
+        X_hgb, cats = prepare_hgb_features(X, churn_keys)
+        hgb = train_hist_gradient_boosting(X_hgb[~test], y_train, categories=cats)
+        backend_model = HGB_MODEL_NAME
+        backend_preds = predict(hgb, X_hgb)
+        backend_proba = predict_proba(hgb, X_hgb)
+        export_predictions(backend_preds, "hgb_churn_predictions.csv", backend_proba, churn_keys, split)
+    else:
+        if tune_rf:
+            rf = tune_random_forest(X_train, y_train, warm_start=True)
+        else:
+            rf = train_random_forest(X_train, y_train)
+        backend_model = RF_MODEL_NAME
+        backend_preds = predict(rf, X)
+        backend_proba = predict_proba(rf, X)
+        export_predictions(backend_preds, "rf_churn_predictions.csv", backend_proba, churn_keys, split)
 
-    try:
-        log_shap(rf, X)
-    except Exception:
-        pass
+        try:
+            log_shap(rf, X_train)
+        except Exception:
+            pass
 
     # forecasting
     ts = prepare_forecast_df(raw)
-    prophet_model = train_prophet(ts)
-    forecast_df = forecast(prophet_model, periods=horizon)
+    forecast_df = forecast_with_backend(ts, backend=forecast_backend, periods=horizon)
 
-    # rolling cv (optional)
-    try:
-        _ = rolling_cv_prophet(ts, n_splits=3)
-    except Exception:
-        pass
+    # out-of-sample accuracy: rolling-origin backtest of the same backend
+    bt_horizon, bt_folds = backtest(ts, backend=forecast_backend, horizon=horizon, n_splits=3)
+    export_backtest(bt_horizon, bt_folds)
 
     # recommender
     matrix, prod_ids, _ = build_item_matrix(raw)
     sim = build_item_similarity(matrix)
+    # persisted top-k table for O(1) lookups; built before recommend_topk, which masks sim in place
+    save_neighbor_index(*build_neighbor_index(sim, prod_ids, top_k=20), prod_ids)
     recs = recommend_topk(sim, prod_ids, top_k=5)
     from phase2_optimized_recommender import export_recommendations as exp_rec
     exp_rec(recs)
 
+    # market basket rules (FP-growth) alongside the similarity recommender
+    rules = mine_rules(raw, min_support=basket_min_support)
+    export_rules(rules)
+    save_csv(rules_to_recommendations(rules, top_k=5), BASKET_RECS_FILE)
+
     # evaluation
     # forecast eval: align historical overlap
     y_true = raw.groupby("transaction_date")["revenue"].sum().reset_index().rename(columns={"transaction_date":"ds"})
-    merged = y_true.merge(forecast_df, on="ds", how="left").fillna(0)
+    merged = y_true.merge(forecast_df, on="ds", how="inner")
     f_metrics = evaluate_forecast(merged["revenue"], merged["yhat"])
-    c_metrics = evaluate_classification(y, lr_preds)
+    c_metrics = evaluate_classification(y[test], lr_preds[test], lr_proba[test])
+    registry = get_registry()
+    registry.set_metrics(LR_MODEL_NAME, registry.active_version(LR_MODEL_NAME), c_metrics)
+    # held-out metrics on the tree model's version too, so versions can be compared before promoting
+    registry.set_metrics(backend_model, registry.active_version(backend_model),
+                         evaluate_classification(y[test], backend_preds[test], backend_proba[test]))
     r_metrics = evaluate_recommendations(recs)
-    all_metrics = {**f_metrics, **c_metrics, **r_metrics}
+    all_metrics = {**f_metrics, **summarize_backtest(bt_horizon), **c_metrics, **r_metrics}
     export_metrics(all_metrics)
 
+    # bootstrap CIs: held-out churn scores per store (paired deltas vs LR), backtest errors per backend
+    export_bootstrap(pd.concat([
+        bootstrap_classification(y[test], {"lr": lr_proba[test], churn_backend: backend_proba[test]},
+                                 groups=churn_keys.loc[test, "store_location"], baseline="lr"),
+        bootstrap_forecast(bt_folds["y"], {forecast_backend: bt_folds["yhat"]}),
+    ], ignore_index=True))
+
     print("Phase2 optimized run complete. Outputs in:", PATHS["models"], PATHS["features"], PATHS["metrics"])
 
 if __name__ == "__main__":
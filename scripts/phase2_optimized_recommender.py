@@ -1,8 +1,6 @@
 import os
 import pandas as pd
 import numpy as np
-from scipy.sparse import csr_matrix
-from sklearn.metrics.pairwise import cosine_similarity
 
 from config import PATHS_OPT as PATHS
 from utils import ensure_dir, save_csv
@@ -11,13 +9,15 @@ MODEL_DIR = PATHS["models"]
 RECS_FILE = os.path.join(MODEL_DIR, "recommendations.csv")
 
 def build_item_matrix(df: pd.DataFrame):
+    from scipy.sparse import csr_matrix
     # transaction_id × product_id binary matrix
     trans_prod = pd.crosstab(df["transaction_id"], df["product_id"])
     prod_ids = trans_prod.columns.tolist()
     matrix = csr_matrix(trans_prod.values)
     return matrix, prod_ids, trans_prod
 
-def build_item_similarity(matrix: csr_matrix):
+def build_item_similarity(matrix):
+    from sklearn.metrics.pairwise import cosine_similarity
     # cosine similarity on item vectors (columns)
     # compute item vectors by transposing transaction-product matrix
     item_mat = matrix.T
@@ -41,10 +41,13 @@ def export_recommendations(recs_df: pd.DataFrame):
     ensure_dir(MODEL_DIR)
     save_csv(recs_df, RECS_FILE)
 
-if __name__ == "__main__":
+def main():
     raw = pd.read_csv(PATHS["phase1_clean"])
     matrix, prod_ids, pivot = build_item_matrix(raw)
     sim = build_item_similarity(matrix)
     recs = recommend_topk(sim, prod_ids, top_k=5)
     export_recommendations(recs)
     print(f"Recommendations saved -> {RECS_FILE}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+
+from config import PATHS_OPT as PATHS
+from utils import ensure_dir
+from phase2_optimized_neighbor_index import topk_rows, save_neighbor_index, INDEX_DIR
+
+STATE_DIR = os.path.join(PATHS["models"], "recommender_state")
+COOC_FILE = "cooccurrence.npz"
+NORMS_FILE = "norms.npy"
+PRODUCT_IDS_FILE = "product_ids.npy"
+NEIGHBORS_FILE = "neighbors.npy"
+SCORES_FILE = "scores.npy"
+META_FILE = "meta.json"
+
+class RecommenderState:
+    """
+    Persistent item-item co-occurrence counts C = X'X (X = basket × product
+    line counts, as in build_item_matrix), per-item norms sqrt(diag(C)) and the
+    cosine top-k table derived from them.
+
+    fold_in() adds a batch of new transactions as a sparse delta and only
+    recomputes the top-k rows whose scores can have changed, so a refresh
+    costs in proportion to the new baskets rather than the full history.
+    """
+
+    def __init__(self, top_k: int = 20, half_life_days: float = None):
+        from scipy.sparse import csr_matrix
+        self.top_k = top_k
+        self.half_life_days = half_life_days
+        self.product_ids = np.empty(0, dtype=np.int64)
+        self.cooc = csr_matrix((0, 0), dtype=np.float64)
+        self.norms = np.empty(0, dtype=np.float64)
+        self.neighbors = np.empty((0, top_k), dtype=np.int32)
+        self.scores = np.empty((0, top_k), dtype=np.float32)
+        self.last_date = None
+        # ingestion watermark: highest basket id folded in so far
+        self.last_transaction_id = None
+
+    @classmethod
+    def from_transactions(cls, df: pd.DataFrame, top_k: int = 20, half_life_days: float = None):
+        state = cls(top_k=top_k, half_life_days=half_life_days)
+        state.fold_in(df)
+        return state
+
+    # === internals ===
+    def _extend_items(self, new_ids: np.ndarray):
+        from scipy.sparse import csr_matrix
+        n_old, n_new = self.product_ids.size, self.product_ids.size + new_ids.size
+        self.product_ids = np.concatenate([self.product_ids, new_ids])
+        cooc = self.cooc.tocoo()
+        self.cooc = csr_matrix((cooc.data, (cooc.row, cooc.col)), shape=(n_new, n_new))
+        self.norms = np.concatenate([self.norms, np.zeros(new_ids.size)])
+        pad = n_new - n_old
+        self.neighbors = np.vstack([self.neighbors, np.full((pad, self.top_k), -1, dtype=np.int32)])
+        self.scores = np.vstack([self.scores, np.full((pad, self.top_k), np.nan, dtype=np.float32)])
+
+    def _delta_matrix(self, df: pd.DataFrame, basket_col: str, item_col: str, date_col: str):
+        """Sparse X for the new baskets (rows weighted by time decay) and the batch's last date."""
+        from scipy.sparse import csr_matrix
+        ids = df[item_col].to_numpy(dtype=np.int64)
+        unseen = np.setdiff1d(np.unique(ids), self.product_ids)
+        if unseen.size:
+            self._extend_items(unseen)
+        order = np.argsort(self.product_ids, kind="stable")
+        item_codes = order[np.searchsorted(self.product_ids, ids, sorter=order)]
+        basket_codes, _ = pd.factorize(df[basket_col])
+        lines = np.ones(len(df))
+        X = csr_matrix((lines, (basket_codes, item_codes)),
+                       shape=(int(basket_codes.max()) + 1, self.product_ids.size))
+        batch_date = None
+        if date_col in df.columns:
+            dates = pd.to_datetime(df[date_col])
+            batch_date = dates.max()
+            if self.half_life_days:
+                # newest basket in the batch has weight 1; older ones in the same batch fade
+                age = (batch_date - dates).dt.days.to_numpy()
+                row_age = np.zeros(X.shape[0])
+                np.maximum.at(row_age, basket_codes, age)
+                w = np.sqrt(0.5 ** (row_age / self.half_life_days))
+                X = csr_matrix(X.multiply(w[:, None]))
+        return X, batch_date
+
+    def _refresh_rows(self, rows: np.ndarray):
+        if rows.size == 0:
+            return
+        C = self.cooc[rows].toarray()
+        denom = self.norms[rows][:, None] * self.norms[None, :]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            sim = np.where(denom > 0, C / denom, 0.0)
+        nbrs, scores = topk_rows(sim, rows, top_k=self.top_k)
+        self.neighbors[rows] = nbrs
+        self.scores[rows] = scores
+
+    # === public API ===
+    def fold_in(self, df: pd.DataFrame, basket_col: str = "transaction_id", item_col: str = "product_id",
+                date_col: str = "transaction_date") -> np.ndarray:
+        """
+        Add new transaction lines. Returns the row indices whose top-k lists
+        were recomputed.
+        """
+        if df.empty:
+            return np.empty(0, dtype=np.int64)
+        X, batch_date = self._delta_matrix(df, basket_col, item_col, date_col)
+        if self.half_life_days and self.last_date is not None and batch_date is not None:
+            # uniform decay leaves cosine ratios between untouched items unchanged
+            elapsed = max((batch_date - self.last_date).days, 0)
+            self.cooc = self.cooc * (0.5 ** (elapsed / self.half_life_days))
+            self.norms = self.norms * np.sqrt(0.5 ** (elapsed / self.half_life_days))
+        delta = (X.T @ X).tocsr()
+        self.cooc = (self.cooc + delta).tocsr()
+        touched = np.flatnonzero(np.asarray(X.sum(axis=0)).ravel() > 0)
+        self.norms[touched] = np.sqrt(self.cooc.diagonal()[touched])
+        # Untouched rows only change through touched items' norms, which can
+        # only grow, pushing those scores down. A row is stale only if one of
+        # its current top-k neighbours was touched.
+        has_touched = np.isin(self.neighbors, touched).any(axis=1)
+        rows = np.union1d(touched, np.flatnonzero(has_touched))
+        self._refresh_rows(rows)
+        if batch_date is not None:
+            self.last_date = batch_date if self.last_date is None else max(self.last_date, batch_date)
+        if pd.api.types.is_integer_dtype(df[basket_col]):
+            batch_id = int(df[basket_col].max())
+            self.last_transaction_id = (batch_id if self.last_transaction_id is None
+                                        else max(self.last_transaction_id, batch_id))
+        return rows
+
+    def new_lines(self, df: pd.DataFrame, basket_col: str = "transaction_id") -> pd.DataFrame:
+        """
+        New baskets only: lines whose basket id is above the watermark. Ids
+        rather than dates, so a new basket dated before last_date is still
+        picked up. Lines added later to a basket already folded in (id at or
+        below the watermark) are not: fold_in() cannot take back that basket's
+        earlier co-occurrences, so such corrections need a rebuild with
+        from_transactions().
+        """
+        if self.last_transaction_id is None:
+            return df
+        return df[df[basket_col] > self.last_transaction_id]
+
+    def similarity(self, product_id_a, product_id_b) -> float:
+        idx = {pid: i for i, pid in enumerate(self.product_ids.tolist())}
+        i, j = idx[product_id_a], idx[product_id_b]
+        denom = self.norms[i] * self.norms[j]
+        return float(self.cooc[i, j] / denom) if denom > 0 else 0.0
+
+    def to_recommendations(self, top_k: int = None) -> pd.DataFrame:
+        """product_id / recommended_product_id / score frame, as in recommend_topk()."""
+        k = top_k or self.top_k
+        nbrs = self.neighbors[:, :k]
+        rows = np.repeat(np.arange(self.product_ids.size), nbrs.shape[1])
+        flat = nbrs.ravel()
+        valid = flat >= 0
+        return pd.DataFrame({
+            "product_id": self.product_ids[rows[valid]],
+            "recommended_product_id": self.product_ids[flat[valid]],
+            "score": self.scores[:, :k].ravel()[valid],
+        })
+
+    def export_index(self, index_dir: str = INDEX_DIR):
+        """Publish the current top-k table as the memory-mapped neighbor index."""
+        return save_neighbor_index(self.neighbors, self.scores, self.product_ids, index_dir=index_dir)
+
+    def save(self, state_dir: str = STATE_DIR):
+        from scipy.sparse import save_npz
+        ensure_dir(state_dir)
+        save_npz(os.path.join(state_dir, COOC_FILE), self.cooc)
+        np.save(os.path.join(state_dir, NORMS_FILE), self.norms)
+        np.save(os.path.join(state_dir, PRODUCT_IDS_FILE), self.product_ids)
+        np.save(os.path.join(state_dir, NEIGHBORS_FILE), self.neighbors)
+        np.save(os.path.join(state_dir, SCORES_FILE), self.scores)
+        meta = {
+            "top_k": self.top_k,
+            "half_life_days": self.half_life_days,
+            "last_date": None if self.last_date is None else str(pd.Timestamp(self.last_date).date()),
+            "last_transaction_id": self.last_transaction_id,
+        }
+        with open(os.path.join(state_dir, META_FILE), "w") as f:
+            json.dump(meta, f, indent=2)
+        return state_dir
+
+    @classmethod
+    def load(cls, state_dir: str = STATE_DIR):
+        from scipy.sparse import load_npz
+        with open(os.path.join(state_dir, META_FILE)) as f:
+            meta = json.load(f)
+        state = cls(top_k=meta["top_k"], half_life_days=meta["half_life_days"])
+        state.cooc = load_npz(os.path.join(state_dir, COOC_FILE)).tocsr()
+        state.norms = np.load(os.path.join(state_dir, NORMS_FILE))
+        state.product_ids = np.load(os.path.join(state_dir, PRODUCT_IDS_FILE))
+        state.neighbors = np.load(os.path.join(state_dir, NEIGHBORS_FILE))
+        state.scores = np.load(os.path.join(state_dir, SCORES_FILE))
+        state.last_date = None if meta["last_date"] is None else pd.Timestamp(meta["last_date"])
+        state.last_transaction_id = meta.get("last_transaction_id")
+        return state
+
+def main():
+    raw = pd.read_csv(PATHS["phase1_clean"], parse_dates=["transaction_date"])
+    state = RecommenderState.load() if os.path.exists(os.path.join(STATE_DIR, META_FILE)) else None
+    if state is not None and state.last_transaction_id is not None:
+        new = state.new_lines(raw)
+        rows = state.fold_in(new)
+        print(f"Folded in {len(new)} transaction lines, refreshed {rows.size} items")
+    else:
+        # no state yet, or one saved before the id watermark existed: rebuild
+        state = RecommenderState.from_transactions(raw)
+        print(f"Built recommender state for {state.product_ids.size} items")
+    state.save()
+    state.export_index()
+
+if __name__ == "__main__":
+    main()
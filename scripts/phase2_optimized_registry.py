@@ -0,0 +1,230 @@
+import os
+import json
+import hashlib
+import logging
+import shutil
+import tempfile
+from datetime import datetime, timezone
+
+from config import PATHS_OPT as PATHS
+from utils import ensure_dir
+
+REGISTRY_DIR = os.path.join(PATHS["models"], "registry")
+ARTIFACT_FILE = "model.joblib"
+META_FILE = "meta.json"
+ACTIVE_FILE = "ACTIVE"
+HISTORY_FILE = "history.json"
+# joblib zlib level for models built from sklearn trees (see default_compress)
+TREE_COMPRESS = 3
+
+def _jsonable(value):
+    """Best-effort conversion of estimator params / metrics for meta.json."""
+    if isinstance(value, dict):
+        return {str(k): _jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(v) for v in value]
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    if hasattr(value, "item"):
+        return value.item()
+    return repr(value)
+
+def _file_hash(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def default_compress(model) -> int:
+    """
+    TREE_COMPRESS for sklearn trees and tree ensembles, 0 otherwise. Tree
+    node tables are copied into private memory when a Tree is unpickled, so
+    mmap_mode cannot share them and compressing them costs nothing at load;
+    it makes a random forest several times smaller on disk.
+    """
+    est = getattr(model, "estimators_", model)
+    while isinstance(est, (list, tuple)) or getattr(est, "ndim", 0):
+        if len(est) == 0:
+            return 0
+        est = est[0] if isinstance(est, (list, tuple)) else est.flat[0]
+    return TREE_COMPRESS if hasattr(est, "tree_") else 0
+
+def _write_atomic(path: str, text: str):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+class ModelRegistry:
+    """
+    Versioned model store. Each artifact lives in <root>/<name>/<version>/
+    with a meta.json (params, metrics, features); the version id is the
+    content hash of the dumped model, so re-registering an identical model is
+    a no-op. <name>/ACTIVE holds the promoted version: promoting or rolling
+    back only rewrites that pointer.
+
+    Uncompressed artifacts are loaded with joblib mmap_mode="r": numpy
+    arrays the estimator holds directly (e.g. HistGradientBoosting predictor
+    nodes, linear coefficients) stay memory-mapped and are shared between
+    processes through the page cache. sklearn Tree objects (decision trees,
+    random forests) copy their node arrays on unpickling, so they get no
+    sharing and are stored compressed by default. Loaded models are cached
+    per process.
+    """
+
+    def __init__(self, root: str = REGISTRY_DIR):
+        self.root = root
+        self._cache = {}
+
+    def _model_dir(self, name: str) -> str:
+        return os.path.join(self.root, name)
+
+    def _version_dir(self, name: str, version: str) -> str:
+        return os.path.join(self.root, name, version)
+
+    # === write side ===
+    def register(self, name: str, model, params: dict = None, metrics: dict = None, features: list = None,
+                 compress: int = None, promote: bool = False) -> str:
+        """
+        Dump `model`, file it under its content hash and return the version id.
+        compress > 0 shrinks the file but disables memory-mapped loading;
+        None picks default_compress(model).
+        """
+        import joblib
+        if compress is None:
+            compress = default_compress(model)
+        ensure_dir(self._model_dir(name))
+        fd, tmp = tempfile.mkstemp(dir=self._model_dir(name), suffix=".joblib.tmp")
+        os.close(fd)
+        try:
+            joblib.dump(model, tmp, compress=compress)
+            version = _file_hash(tmp)[:16]
+            vdir = self._version_dir(name, version)
+            if os.path.exists(os.path.join(vdir, META_FILE)):
+                os.remove(tmp)
+                logging.info(f"[OK] {name} version {version} already registered.")
+            else:
+                ensure_dir(vdir)
+                os.replace(tmp, os.path.join(vdir, ARTIFACT_FILE))
+                if params is None and hasattr(model, "get_params"):
+                    params = model.get_params()
+                meta = {
+                    "name": name,
+                    "version": version,
+                    "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                    "model_class": type(model).__name__,
+                    "compress": compress,
+                    "size_bytes": os.path.getsize(os.path.join(vdir, ARTIFACT_FILE)),
+                    "params": _jsonable(params or {}),
+                    "metrics": _jsonable(metrics or {}),
+                    "features": list(features) if features is not None else None,
+                }
+                _write_atomic(os.path.join(vdir, META_FILE), json.dumps(meta, indent=2))
+                logging.info(f"[OK] Registered {name} version {version}.")
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        if promote:
+            self.promote(name, version)
+        return version
+
+    def set_metrics(self, name: str, version: str, metrics: dict):
+        meta = self.metadata(name, version)
+        meta["metrics"].update(_jsonable(metrics))
+        _write_atomic(os.path.join(self._version_dir(name, version), META_FILE), json.dumps(meta, indent=2))
+
+    def promote(self, name: str, version: str):
+        if not os.path.exists(os.path.join(self._version_dir(name, version), META_FILE)):
+            raise KeyError(f"Unknown version {version} for model {name}")
+        history = self.history(name)
+        if not history or history[-1] != version:
+            history.append(version)
+        _write_atomic(os.path.join(self._model_dir(name), HISTORY_FILE), json.dumps(history, indent=2))
+        _write_atomic(os.path.join(self._model_dir(name), ACTIVE_FILE), version)
+        logging.info(f"[OK] Promoted {name} -> {version}.")
+
+    def rollback(self, name: str) -> str:
+        """Re-activate the previously promoted version and return it."""
+        history = self.history(name)
+        if len(history) < 2:
+            raise ValueError(f"No earlier promoted version of {name} to roll back to")
+        history.pop()
+        _write_atomic(os.path.join(self._model_dir(name), HISTORY_FILE), json.dumps(history, indent=2))
+        _write_atomic(os.path.join(self._model_dir(name), ACTIVE_FILE), history[-1])
+        logging.info(f"[OK] Rolled back {name} -> {history[-1]}.")
+        return history[-1]
+
+    def prune(self, name: str, keep: int = 5):
+        """Delete the oldest non-promoted versions beyond `keep`."""
+        protected = set(self.history(name))
+        versions = [v for v in self.list_versions(name) if v["version"] not in protected]
+        for meta in versions[:-keep] if keep else versions:
+            shutil.rmtree(self._version_dir(name, meta["version"]), ignore_errors=True)
+
+    # === read side ===
+    def active_version(self, name: str) -> str:
+        path = os.path.join(self._model_dir(name), ACTIVE_FILE)
+        if not os.path.exists(path):
+            raise KeyError(f"No active version for model {name}")
+        with open(path) as f:
+            return f.read().strip()
+
+    def history(self, name: str) -> list:
+        path = os.path.join(self._model_dir(name), HISTORY_FILE)
+        if not os.path.exists(path):
+            return []
+        with open(path) as f:
+            return json.load(f)
+
+    def metadata(self, name: str, version: str = None) -> dict:
+        version = version or self.active_version(name)
+        with open(os.path.join(self._version_dir(name, version), META_FILE)) as f:
+            return json.load(f)
+
+    def list_versions(self, name: str) -> list:
+        """Metadata of every registered version, oldest first (artifacts are not opened)."""
+        mdir = self._model_dir(name)
+        if not os.path.isdir(mdir):
+            return []
+        metas = [self.metadata(name, v) for v in os.listdir(mdir)
+                 if os.path.exists(os.path.join(mdir, v, META_FILE))]
+        return sorted(metas, key=lambda m: m["created_at"])
+
+    def load(self, name: str, version: str = None, mmap: bool = True):
+        """
+        Load a version (default: the active one). Only the small ACTIVE file is
+        read on each call; the artifact itself is opened once per process.
+        Uncompressed artifacts are memory-mapped (see the class docstring for
+        which arrays that covers).
+        """
+        import joblib
+        version = version or self.active_version(name)
+        key = (name, version)
+        if key not in self._cache:
+            meta = self.metadata(name, version)
+            mmap_mode = "r" if mmap and not meta.get("compress") else None
+            self._cache[key] = joblib.load(os.path.join(self._version_dir(name, version), ARTIFACT_FILE),
+                                           mmap_mode=mmap_mode)
+        return self._cache[key]
+
+_DEFAULT_REGISTRY = None
+
+def get_registry() -> ModelRegistry:
+    global _DEFAULT_REGISTRY
+    if _DEFAULT_REGISTRY is None:
+        _DEFAULT_REGISTRY = ModelRegistry()
+    return _DEFAULT_REGISTRY
+
+def main():
+    registry = get_registry()
+    names = sorted(os.listdir(registry.root)) if os.path.isdir(registry.root) else []
+    for name in names:
+        history = registry.history(name)
+        active = history[-1] if history else None
+        for meta in registry.list_versions(name):
+            flag = "*" if meta["version"] == active else " "
+            print(f"{flag} {name:<12} {meta['version']}  {meta['created_at']}  {meta['model_class']}  {meta['metrics']}")
+
+if __name__ == "__main__":
+    main()
@@ -43,7 +43,7 @@ def run_phase2_pipeline():
     forecast_metrics = evaluate_forecast(y_true_forecast, y_pred_forecast)
 
     # Churn metrics
-    churn_metrics = evaluate_classification(y_churn, lr_preds)
+    churn_metrics = evaluate_classification(y_churn, lr_preds, lr_model.predict_proba(features_df)[:, 1])
 
     # Recommendation metrics
     # Placeholder: using predicted recommendations as ground truth for demo
@@ -1,12 +1,12 @@
 # utils.py
 import os
 import pandas as pd
-from sqlalchemy import create_engine
 import logging
 import config
 
 def get_db_connection():
     """Create a SQLAlchemy engine for MySQL."""
+    from sqlalchemy import create_engine
     try:
         engine = create_engine(
             f"mysql+pymysql://{config.MYSQL_USER}:{config.MYSQL_PASSWORD}"
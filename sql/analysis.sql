@@ -86,6 +86,7 @@ FROM inactive_products
 ORDER BY days_since_sold DESC;
 
 -- 7. Recommender-style: products frequently bought together
+-- (pairs only; scripts/phase2_optimized_basket.py mines itemsets of any size with support/confidence/lift)
 SELECT a.product_detail AS product_a,
     b.product_detail AS product_b,
     COUNT(*) AS times_bought_together
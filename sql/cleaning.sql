@@ -1,8 +1,35 @@
 -- cleaning.sql
--- Create a cleaned view from raw sales table
-DROP TABLE IF EXISTS sales_cleaned;
+-- Reference copy of the sales_cleaned cleaning rules. Superseded by
+-- scripts/phase1_cleaning_job.py (`python cli.py clean-sql`), which runs the
+-- same statement in batches with a stored watermark and also checks, and
+-- rebuilds, the indexes. Do not run this file on its own against a database
+-- built with the old cleaning.sql / optimization.sql: CREATE TABLE IF NOT
+-- EXISTS keeps their non-unique idx_transaction_product, so ON DUPLICATE KEY
+-- never fires and every rerun duplicates lines.
+--
+-- The table is never dropped. Rows from LOOKBACK_IDS (1000) ids below the last
+-- cleaned transaction_id onwards are cleaned again, like the job does, so lines
+-- added to a recent basket and corrections to recent rows are picked up;
+-- existing (transaction_id, product_id) lines are updated in place.
+CREATE TABLE IF NOT EXISTS sales_cleaned (
+    transaction_id INT NOT NULL,
+    transaction_date DATE,
+    transaction_time TIME,
+    transaction_qty INT,
+    store_id INT,
+    store_location VARCHAR(100),
+    product_id INT,
+    unit_price FLOAT,
+    product_category VARCHAR(100),
+    product_type VARCHAR(100),
+    product_detail VARCHAR(100),
+    UNIQUE KEY idx_transaction_product (transaction_id, product_id)
+);
 
-CREATE TABLE sales_cleaned AS
+SET @lookback_ids = 1000;
+SET @clean_from = (SELECT GREATEST(COALESCE(MAX(transaction_id), 0) - @lookback_ids, 0) FROM sales_cleaned);
+
+INSERT INTO sales_cleaned
 SELECT transaction_id,
     transaction_date,
     transaction_time,
@@ -14,4 +41,15 @@ SELECT transaction_id,
     UPPER(TRIM(COALESCE(product_category, 'Unknown'))) AS product_category,
     UPPER(TRIM(COALESCE(product_type, 'Unknown'))) AS product_type,
     TRIM(COALESCE(product_detail, 'Unknown')) AS product_detail
-FROM sales;
\ No newline at end of file
+FROM sales
+WHERE transaction_id > @clean_from
+ON DUPLICATE KEY UPDATE
+    transaction_date = VALUES(transaction_date),
+    transaction_time = VALUES(transaction_time),
+    transaction_qty = VALUES(transaction_qty),
+    store_id = VALUES(store_id),
+    store_location = VALUES(store_location),
+    unit_price = VALUES(unit_price),
+    product_category = VALUES(product_category),
+    product_type = VALUES(product_type),
+    product_detail = VALUES(product_detail);
@@ -17,4 +17,5 @@ CREATE INDEX idx_product_date ON sales_cleaned(product_id, transaction_date);
 -- 4. Join-related queries (module 7)
 CREATE INDEX idx_transaction_id ON sales_cleaned(transaction_id);
 
-CREATE INDEX idx_transaction_product ON sales_cleaned(transaction_id, product_id);
\ No newline at end of file
+-- idx_transaction_product (transaction_id, product_id) is created UNIQUE with the
+-- table in cleaning.sql; the upsert keys on it.
\ No newline at end of file
@@ -1,10 +1,12 @@
 -- validation.sql
 -- QA checks for data quality
+-- The same checks (plus schema and category checks) run automatically on every
+-- phase-1 load in scripts/phase1_validation.py; these queries are for ad-hoc QA.
 
--- 1. Duplicate transactions
-SELECT transaction_id, COUNT(*) AS dup_count
+-- 1. Duplicate transaction lines (a transaction_id is a basket with one line per product)
+SELECT transaction_id, product_id, COUNT(*) AS dup_count
 FROM sales_cleaned
-GROUP BY transaction_id
+GROUP BY transaction_id, product_id
 HAVING COUNT(*) > 1;
 
 -- 2. Missing critical fields
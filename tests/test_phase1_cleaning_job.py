@@ -0,0 +1,123 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+sqlalchemy = pytest.importorskip("sqlalchemy")
+from sqlalchemy import create_engine, inspect, text
+
+import phase1_cleaning_job as job
+
+def sales_rows(rows):
+    cols = list(job.COLUMNS)
+    return pd.DataFrame(rows, columns=cols)
+
+BASE_SALES = [
+    # basket 1: two lines
+    (1, "2024-01-01", "08:00:00", 1, 3, " Astoria ", 10, 2.5, "coffee", " latte", "Latte Rg "),
+    (1, "2024-01-01", "08:00:00", 2, 3, "Astoria", 11, 3.0, "Bakery", "Scone", "Scone"),
+    (2, "2024-01-01", "09:30:00", None, 5, None, 10, 2.5, "Coffee", "Latte", "Latte Rg"),
+    # basket 3: two lines
+    (3, "2024-01-02", "10:15:00", 1, 8, "Lower Manhattan", 12, 4.0, "Tea", "Chai", "Chai Lg"),
+    (3, "2024-01-02", "10:15:00", 1, 8, "Lower Manhattan", 10, 2.5, "Coffee", "Latte", "Latte Rg"),
+]
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'cafe.db'}")
+    sales_rows(BASE_SALES).to_sql(job.SOURCE_TABLE, engine, index=False)
+    yield engine
+    engine.dispose()
+
+def cleaned(engine) -> pd.DataFrame:
+    with engine.connect() as conn:
+        df = pd.read_sql(text(f"SELECT * FROM {job.TARGET_TABLE}"), conn)
+    return df.sort_values(list(job.UPSERT_KEY)).reset_index(drop=True)
+
+def append_sales(engine, rows):
+    sales_rows(rows).to_sql(job.SOURCE_TABLE, engine, index=False, if_exists="append")
+
+def set_price(engine, transaction_id, product_id, price):
+    with engine.begin() as conn:
+        conn.execute(text(f"UPDATE {job.SOURCE_TABLE} SET unit_price = :p "
+                          "WHERE transaction_id = :t AND product_id = :pid"),
+                     {"p": price, "t": transaction_id, "pid": product_id})
+
+def test_first_run_cleans_every_line(engine):
+    stats = job.run_cleaning_job(engine, batch_size=2)
+    df = cleaned(engine)
+    assert len(df) == len(BASE_SALES)
+    assert stats["watermark"] == 3
+    assert stats["batches"] == 2
+    first = df.iloc[0]
+    assert first["store_location"] == "Astoria"
+    assert first["product_category"] == "COFFEE"
+    assert first["product_type"] == "LATTE"
+    assert first["product_detail"] == "Latte Rg"
+    missing = df[df["transaction_id"] == 2].iloc[0]
+    assert missing["transaction_qty"] == 0
+    assert missing["store_location"] == "Unknown"
+    job.verify_indexes(engine)
+
+def test_rerun_is_idempotent(engine):
+    job.run_cleaning_job(engine, batch_size=2)
+    before = cleaned(engine)
+    stats = job.run_cleaning_job(engine, batch_size=2)
+    pd.testing.assert_frame_equal(cleaned(engine), before)
+    assert stats["watermark"] == 3
+
+def test_late_arriving_lines_and_updates_are_upserted(engine):
+    job.run_cleaning_job(engine)
+    # a line added to an already cleaned basket, a price correction and a new basket
+    append_sales(engine, [
+        (3, "2024-01-02", "10:15:00", 1, 8, "Lower Manhattan", 11, 3.0, "Bakery", "Scone", "Scone"),
+        (4, "2024-01-03", "07:45:00", 1, 3, "Astoria", 12, 4.0, "Tea", "Chai", "Chai Lg"),
+    ])
+    set_price(engine, 3, 12, 4.5)
+    stats = job.run_cleaning_job(engine)
+    df = cleaned(engine)
+    assert len(df) == len(BASE_SALES) + 2
+    assert not df.duplicated(list(job.UPSERT_KEY)).any()
+    assert df.loc[(df["transaction_id"] == 3) & (df["product_id"] == 12), "unit_price"].item() == 4.5
+    assert ((df["transaction_id"] == 3) & (df["product_id"] == 11)).any()
+    assert stats["watermark"] == 4
+
+def test_updates_behind_the_lookback_window_need_full_refresh(engine):
+    job.run_cleaning_job(engine, lookback=0)
+    set_price(engine, 1, 10, 9.0)
+    job.run_cleaning_job(engine, lookback=0)
+    price = lambda df: df.loc[(df["transaction_id"] == 1) & (df["product_id"] == 10), "unit_price"].item()
+    assert price(cleaned(engine)) == 2.5
+    job.run_cleaning_job(engine, lookback=0, full_refresh=True)
+    df = cleaned(engine)
+    assert price(df) == 9.0
+    assert len(df) == len(BASE_SALES)
+
+def legacy_table(engine, rows):
+    """sales_cleaned as built by the old DROP/CREATE cleaning.sql and optimization.sql."""
+    with engine.begin() as conn:
+        conn.execute(text(job.TARGET_DDL))
+        conn.execute(text(f"CREATE INDEX idx_transaction_product ON {job.TARGET_TABLE}(transaction_id, product_id)"))
+    sales_rows(rows).to_sql(job.TARGET_TABLE, engine, index=False, if_exists="append")
+
+def test_non_unique_upsert_index_is_rebuilt(engine):
+    legacy_table(engine, BASE_SALES[:2])
+    assert job.check_indexes(engine)[1] == ["idx_transaction_product"]
+    job.run_cleaning_job(engine)
+    job.run_cleaning_job(engine, full_refresh=True)
+    ix = {i["name"]: i for i in inspect(engine).get_indexes(job.TARGET_TABLE)}
+    assert ix["idx_transaction_product"]["unique"]
+    assert ix["idx_transaction_product"]["column_names"] == list(job.UPSERT_KEY)
+    assert len(cleaned(engine)) == len(BASE_SALES)
+
+def test_rebuild_fails_loudly_on_duplicate_lines(engine):
+    legacy_table(engine, BASE_SALES[:2] + BASE_SALES[:1])
+    with pytest.raises(RuntimeError, match="idx_transaction_product"):
+        job.run_cleaning_job(engine)
+    # the old index survives the failed rebuild and the job still refuses to run
+    with pytest.raises(RuntimeError):
+        job.verify_indexes(engine)
+    assert len(cleaned(engine)) == 3